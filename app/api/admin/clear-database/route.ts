@@ -1,5 +1,5 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { unlink, readdir } from "fs/promises"
+import { unlink, readdir, writeFile, mkdir } from "fs/promises"
 import path from "path"
 import sqlite3 from "sqlite3"
 import jwt from "jsonwebtoken"
@@ -56,11 +56,34 @@ export async function POST(request: NextRequest) {
     }
 
     // Clear vectorstore
+    const vectorstoreFiles = [
+      "index.faiss",
+      "chunks.bin",
+      "chunks.idx",
+      "chunks_sources.json",
+      "lexical.db",
+      "chunks.pkl",
+      "manifest.json",
+      "index_meta.json",
+    ]
+    for (const file of vectorstoreFiles) {
+      try {
+        await unlink(path.join("vectorstore", file))
+      } catch (error: any) {
+        if (error?.code !== "ENOENT") {
+          console.error("Vectorstore clear error:", error)
+        }
+      }
+    }
+
+    // Bump the data version stamps so running chat workers drop cached answers
     try {
-      await unlink("vectorstore/index.faiss")
-      await unlink("vectorstore/chunks.pkl")
+      const stamp = process.hrtime.bigint().toString()
+      await mkdir("vectorstore", { recursive: true })
+      await writeFile("vectorstore/.version", stamp)
+      await writeFile("data/.universities.version", stamp)
     } catch (error) {
-      console.error("Vectorstore clear error:", error)
+      console.error("Data version stamp error:", error)
     }
 
     return NextResponse.json({
@@ -4,7 +4,7 @@ import path from "path"
 
 export async function POST(request: NextRequest) {
   try {
-    const { url, keepOldData } = await request.json()
+    const { url, urls, keepOldData } = await request.json()
 
     // Verify admin authentication
     const authHeader = request.headers.get("authorization")
@@ -13,12 +13,15 @@ export async function POST(request: NextRequest) {
     }
 
     // Call Python subprocess for web scraping
-    const result = await scrapeWebsiteWithPython(url, keepOldData)
+    const result = await scrapeWebsiteWithPython(url, urls, keepOldData)
 
     return NextResponse.json({
       success: true,
       pages: result.pages,
-      message: `Successfully scraped ${result.pages} pages from ${url}`,
+      written: result.written,
+      unchanged: result.unchanged,
+      removed: result.removed,
+      message: `Successfully scraped ${result.pages} pages from ${result.url} (${result.written} new or changed)`,
     })
   } catch (error) {
     console.error("Scrape API error:", error)
@@ -26,14 +29,14 @@ export async function POST(request: NextRequest) {
   }
 }
 
-async function scrapeWebsiteWithPython(url: string, keepOldData: boolean): Promise<any> {
+async function scrapeWebsiteWithPython(url: string, urls: string[] | undefined, keepOldData: boolean): Promise<any> {
   return new Promise((resolve, reject) => {
     const pythonScript = path.join(process.cwd(), "scripts", "web_scraper.py")
     const pythonProcess = spawn("python", [pythonScript], {
       stdio: ["pipe", "pipe", "pipe"],
     })
 
-    const inputData = JSON.stringify({ url, keepOldData })
+    const inputData = JSON.stringify({ url, urls, keepOldData })
     let outputData = ""
     let errorData = ""
 
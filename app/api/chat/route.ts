@@ -1,39 +1,41 @@
 // app/api/chat/route.ts
-import { spawn } from 'child_process';
-import path from 'path';
 import { NextRequest, NextResponse } from 'next/server';
+import { getChatWorker } from '@/lib/chat-worker';
 
 export async function POST(request: NextRequest) {
   try {
-    const { message, language, history } = await request.json();
-    const pythonScriptPath = path.join(process.cwd(), 'scripts', 'chat_processor.py');
-    const pythonProcess = spawn('python3', [pythonScriptPath], {
-      env: { ...process.env, GOOGLE_API_KEY: process.env.GOOGLE_API_KEY },
-    });
-
-    let output = '';
-    let errorOutput = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      output += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      errorOutput += data.toString();
-    });
-
-    pythonProcess.stdin.write(JSON.stringify({ message, language, history }));
-    pythonProcess.stdin.end();
-
-    await new Promise((resolve) => pythonProcess.on('close', resolve));
-
-    if (errorOutput) {
-      throw new Error(errorOutput);
+    const { message, language, history, stream } = await request.json();
+
+    if (stream) {
+      // Newline-delimited JSON events: sources, text deltas, then a final "done" event
+      const encoder = new TextEncoder();
+      const body = new ReadableStream({
+        async start(controller) {
+          const send = (event: any) => controller.enqueue(encoder.encode(JSON.stringify(event) + '\n'));
+          try {
+            const done = await getChatWorker().request({ op: 'chat', message, language, history, stream: true }, send);
+            send(done);
+          } catch (error) {
+            send({ type: 'error', error: error.message });
+          }
+          controller.close();
+        },
+      });
+      return new Response(body, { headers: { 'Content-Type': 'application/x-ndjson' } });
     }
 
-    const result = JSON.parse(output);
+    const result = await getChatWorker().request({ op: 'chat', message, language, history });
     return NextResponse.json(result);
   } catch (error) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
 }
+
+export async function GET() {
+  try {
+    const status = await getChatWorker().request({ op: 'ready' });
+    return NextResponse.json(status);
+  } catch (error) {
+    return NextResponse.json({ ready: false, error: error.message }, { status: 503 });
+  }
+}
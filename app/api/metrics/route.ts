@@ -0,0 +1,18 @@
+// app/api/metrics/route.ts
+import { NextRequest, NextResponse } from 'next/server';
+import { getChatWorker } from '@/lib/chat-worker';
+
+// Prometheus text by default; ?format=json returns p50/p95/p99 per stage
+export async function GET(request: NextRequest) {
+  try {
+    const metrics = await getChatWorker().request({ op: 'metrics' });
+    if (request.nextUrl.searchParams.get('format') === 'json') {
+      return NextResponse.json(metrics.summary);
+    }
+    return new Response(metrics.prometheus, {
+      headers: { 'Content-Type': 'text/plain; version=0.0.4' },
+    });
+  } catch (error) {
+    return NextResponse.json({ error: error.message }, { status: 503 });
+  }
+}
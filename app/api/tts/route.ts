@@ -6,14 +6,13 @@ export async function POST(request: NextRequest) {
   try {
     const { text, language } = await request.json()
 
-    // Call Python subprocess for TTS generation
-    const audioBuffer = await generateTTSWithPython(text, language)
+    // Call Python subprocess for TTS generation; audio is forwarded segment by segment as it is synthesized
+    const audioStream = await generateTTSWithPython(text, language)
 
-    return new NextResponse(audioBuffer, {
+    return new NextResponse(audioStream, {
       status: 200,
       headers: {
         "Content-Type": "audio/mpeg",
-        "Content-Length": audioBuffer.length.toString(),
       },
     })
   } catch (error) {
@@ -22,7 +21,7 @@ export async function POST(request: NextRequest) {
   }
 }
 
-async function generateTTSWithPython(text: string, language: string): Promise<Buffer> {
+async function generateTTSWithPython(text: string, language: string): Promise<ReadableStream<Uint8Array>> {
   return new Promise((resolve, reject) => {
     const pythonScript = path.join(process.cwd(), "scripts", "tts_generator.py")
     const pythonProcess = spawn("python", [pythonScript], {
@@ -30,26 +29,40 @@ async function generateTTSWithPython(text: string, language: string): Promise<Bu
     })
 
     const inputData = JSON.stringify({ text, language })
-    let outputBuffer = Buffer.alloc(0)
     let errorData = ""
+    let started = false
 
-    pythonProcess.stdout.on("data", (data) => {
-      outputBuffer = Buffer.concat([outputBuffer, data])
+    // Resolves with the first audio bytes, so the request fails cleanly if nothing was synthesized
+    const stream = new ReadableStream<Uint8Array>({
+      start(controller) {
+        pythonProcess.stdout.on("data", (data: Buffer) => {
+          if (!started) {
+            started = true
+            resolve(stream)
+          }
+          controller.enqueue(new Uint8Array(data))
+        })
+
+        pythonProcess.on("close", (code) => {
+          if (code !== 0) {
+            console.error("TTS Python process error:", errorData)
+          }
+          if (started) {
+            controller.close()
+          } else {
+            reject(new Error("TTS generation failed"))
+          }
+        })
+      },
+      cancel() {
+        pythonProcess.kill()
+      },
     })
 
     pythonProcess.stderr.on("data", (data) => {
       errorData += data.toString()
     })
 
-    pythonProcess.on("close", (code) => {
-      if (code === 0 && outputBuffer.length > 0) {
-        resolve(outputBuffer)
-      } else {
-        console.error("TTS Python process error:", errorData)
-        reject(new Error("TTS generation failed"))
-      }
-    })
-
     pythonProcess.stdin.write(inputData)
     pythonProcess.stdin.end()
   })
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Compare two benchmark result files, printing every timing or rate that changed by more than a threshold"""
+import sys
+import json
+from typing import Dict, Any
+
+# Metric names where a larger value is better; every other number is treated as a duration
+HIGHER_IS_BETTER = ("qps", "throughput", "chunks_per_sec", "recall_at_20")
+COMPARED = ("seconds", "mean", "p50", "p95", "p99", "max") + HIGHER_IS_BETTER
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves keyed by their slash-separated path"""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}/{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.05):
+    before, after = flatten(base["results"]), flatten(new["results"])
+    print(f"{base.get('commit', '')[:10]} -> {new.get('commit', '')[:10]}")
+    for path in sorted(before.keys() & after.keys()):
+        metric = path.rsplit("/", 1)[-1]
+        if metric not in COMPARED or not before[path]:
+            continue
+        change = (after[path] - before[path]) / before[path]
+        if abs(change) < threshold:
+            continue
+        better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+        print(f"{'better' if better else 'WORSE ':6} {change:+8.1%}  {path}: {before[path]:g} -> {after[path]:g}")
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: compare.py BASE.json NEW.json [THRESHOLD]", file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        base = json.load(f)
+    with open(sys.argv[2], encoding="utf-8") as f:
+        new = json.load(f)
+    compare(base, new, float(sys.argv[3]) if len(sys.argv) > 3 else 0.05)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Offline stand-in for google.generativeai: writes SQL for SQL prompts and a fixed answer otherwise,
+after BENCH_LLM_LATENCY_MS milliseconds"""
+import os
+import re
+import time
+
+LATENCY = float(os.getenv('BENCH_LLM_LATENCY_MS', 300)) / 1000
+# Streamed answers arrive in this many chunks spread over the latency
+STREAM_CHUNKS = 8
+
+ANSWER = ("Universities in this dataset list tuition, programs, location and visa support. "
+          "Check the admission requirements of each program and apply for an F-1 visa once admitted.")
+
+def configure(**kwargs):
+    pass
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+
+def sql_for(prompt: str) -> str:
+    query = prompt.rsplit("User query:", 1)[-1].split("SQL query:")[0].strip()
+    match = re.search(r"tuition (?:at|of|for) (.+?)\??$", query, re.IGNORECASE)
+    if match:
+        return f"SELECT tuition FROM universities WHERE university = '{match.group(1)}';"
+    match = re.search(r"universities (?:offer|with) (.+?)\??$", query, re.IGNORECASE)
+    if match:
+        return f"SELECT university FROM universities WHERE program = '{match.group(1)}';"
+    return "No relevant data in database."
+
+class GenerativeModel:
+    def __init__(self, name: str = None):
+        self.name = name
+    
+    def generate_content(self, prompt: str, stream: bool = False):
+        text = sql_for(prompt) if "SQL query:" in prompt else ANSWER
+        if not stream:
+            time.sleep(LATENCY)
+            return Response(text)
+        return self.stream(text)
+    
+    def stream(self, text: str):
+        words = text.split(" ")
+        size = max(1, len(words) // STREAM_CHUNKS)
+        for start in range(0, len(words), size):
+            time.sleep(LATENCY / STREAM_CHUNKS)
+            yield Response(" ".join(words[start:start + size]) + " ")
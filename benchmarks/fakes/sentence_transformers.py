@@ -0,0 +1,33 @@
+"""Offline stand-in for sentence_transformers: deterministic unit vectors seeded by each text's hash,
+plus BENCH_EMBED_LATENCY_MS milliseconds per encode call"""
+import os
+import time
+import hashlib
+import numpy as np
+
+LATENCY = float(os.getenv('BENCH_EMBED_LATENCY_MS', 5)) / 1000
+DIMENSION = int(os.getenv('BENCH_EMBED_DIMENSION', 384))
+
+class SentenceTransformer:
+    def __init__(self, name: str = None, *args, **kwargs):
+        self.name = name
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return DIMENSION
+    
+    def encode(self, texts, **kwargs):
+        time.sleep(LATENCY)
+        vectors = np.empty((len(texts), DIMENSION), dtype="float32")
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vectors[row] = np.random.default_rng(seed).standard_normal(DIMENSION)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+class CrossEncoder:
+    def __init__(self, name: str = None, *args, **kwargs):
+        self.name = name
+    
+    def predict(self, pairs, **kwargs):
+        time.sleep(LATENCY)
+        return np.array([len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs], dtype="float32")
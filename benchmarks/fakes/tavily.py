@@ -0,0 +1,17 @@
+"""Offline stand-in for tavily: crawls return synthetic pages after BENCH_CRAWL_LATENCY_MS milliseconds"""
+import os
+import time
+
+LATENCY = float(os.getenv('BENCH_CRAWL_LATENCY_MS', 500)) / 1000
+PAGES = int(os.getenv('BENCH_CRAWL_PAGES', 20))
+
+class TavilyClient:
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+    
+    def crawl(self, url: str, **kwargs):
+        time.sleep(LATENCY)
+        return {"results": [
+            {"url": f"{url.rstrip('/')}/page-{page}", "raw_content": f"Page {page} of {url}. Programs, tuition and visa support."}
+            for page in range(PAGES)
+        ]}
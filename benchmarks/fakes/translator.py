@@ -0,0 +1,12 @@
+"""Offline translation backend for TRANSLATION_BACKEND=translator:FakeTranslator:
+returns texts unchanged after BENCH_TRANSLATE_LATENCY_MS milliseconds per batch"""
+import os
+import time
+from typing import List
+
+LATENCY = float(os.getenv('BENCH_TRANSLATE_LATENCY_MS', 150)) / 1000
+
+class FakeTranslator:
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        time.sleep(LATENCY)
+        return list(texts)
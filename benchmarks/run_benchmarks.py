@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for indexing, index loading, FAISS search, SQL routing and the end-to-end chat pipeline.
+
+Gemini, the translator, Tavily and sentence-transformers are replaced by the stand-ins in benchmarks/fakes,
+each with a configurable latency, so runs need no network or API keys. Everything runs in a scratch
+directory and the results are written as JSON so runs can be compared across commits with compare.py."""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKES_DIR = os.path.join(BENCH_DIR, "fakes")
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+
+BENCHMARKS = ("indexing", "load", "search", "sql", "chat", "crawl")
+
+UNIVERSITY_WORDS = ["North", "South", "Lake", "River", "Hill", "Valley", "Coast", "Capital", "Pacific", "Atlantic"]
+PROGRAMS = ["Computer Science", "Data Science", "Business Administration", "Mechanical Engineering",
+            "Public Health", "Economics", "Architecture", "Law", "Biotechnology", "AI Studies"]
+LOCATIONS = ["Boston, MA", "Austin, TX", "Seattle, WA", "Toronto, ON", "London, UK", "Sydney, AU", "Berlin, DE"]
+TOPICS = ["admission requirements", "scholarships", "F-1 visa interviews", "housing", "application deadlines",
+          "English tests", "internships", "post-study work visas", "financial documents", "campus life"]
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"comma-separated benchmarks to run (default: {','.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma-separated corpus sizes in chunks, 1000 to 1000000 (default: 1000,10000)")
+    parser.add_argument("--index-types", default="flat,ivf_flat,hnsw,ivf_pq",
+                        help="comma-separated index types to build and search")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the synthetic universities table")
+    parser.add_argument("--search-queries", type=int, default=1000, help="FAISS searches per index")
+    parser.add_argument("--sql-queries", type=int, default=200, help="try_sql_query calls")
+    parser.add_argument("--requests", type=int, default=200, help="chat requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--workers", type=int, default=1, help="chat worker processes (1 serves in-process)")
+    parser.add_argument("--crawl-seeds", type=int, default=8, help="seed URLs crawled concurrently")
+    parser.add_argument("--foreign-ratio", type=float, default=0.2, help="share of chat requests in Spanish")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--translate-latency-ms", type=float, default=150)
+    parser.add_argument("--embed-latency-ms", type=float, default=5)
+    parser.add_argument("--crawl-latency-ms", type=float, default=500)
+    parser.add_argument("--embedding-cache-size", type=int, default=0,
+                        help="EMBEDDING_CACHE_SIZE during the run (default 0, so every chunk is encoded)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a new temporary one)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", default=None,
+                        help="results file (default: benchmarks/results/<commit>_<timestamp>.json)")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Point every external dependency at its offline stand-in before any project module is imported"""
+    os.environ.update({
+        "BENCH_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "BENCH_TRANSLATE_LATENCY_MS": str(args.translate_latency_ms),
+        "BENCH_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "BENCH_CRAWL_LATENCY_MS": str(args.crawl_latency_ms),
+        "GOOGLE_API_KEY": "offline",
+        "TAVILY_API_KEY": "offline",
+        "TRANSLATION_BACKEND": "translator:FakeTranslator",
+        "EMBEDDING_CACHE_SIZE": str(args.embedding_cache_size),
+        "RERANKER_MODEL": "",
+    })
+    # Spawned chat workers inherit sys.path, so they import the same stand-ins
+    sys.path[:0] = [FAKES_DIR, SCRIPTS_DIR]
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 6),
+        "p50": round(pick(0.5), 6),
+        "p95": round(pick(0.95), 6),
+        "p99": round(pick(0.99), 6),
+        "max": round(ordered[-1], 6)
+    }
+
+def university_name(number: int) -> str:
+    return f"{UNIVERSITY_WORDS[number % len(UNIVERSITY_WORDS)]} University {number}"
+
+def write_universities(rows: int, rng: random.Random):
+    """Synthetic universities table, with the indexes the chat server creates"""
+    import db
+    os.makedirs("data", exist_ok=True)
+    with db.transaction() as conn:
+        conn.execute("DROP TABLE IF EXISTS universities")
+        conn.execute("""
+            CREATE TABLE universities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                university TEXT,
+                program TEXT,
+                tuition INTEGER,
+                location TEXT,
+                visa_service TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO universities (university, program, tuition, location, visa_service) VALUES (?, ?, ?, ?, ?)",
+            ((university_name(number), PROGRAMS[number % len(PROGRAMS)], rng.randrange(15000, 70000, 10),
+              rng.choice(LOCATIONS), "F-1 Visa Support") for number in range(rows))
+        )
+    db.ensure_indexes(db.connect())
+
+def write_corpus(chunks: int, rng: random.Random, chunk_size: int, chunks_per_file: int = 200):
+    """Synthetic scraped_data files holding about `chunks` chunks of `chunk_size` characters"""
+    shutil.rmtree("scraped_data", ignore_errors=True)
+    os.makedirs("scraped_data")
+    number = 0
+    for file_number in range(0, chunks, chunks_per_file):
+        paragraphs = []
+        for _ in range(min(chunks_per_file, chunks - file_number)):
+            sentences = []
+            while sum(len(sentence) + 1 for sentence in sentences) < chunk_size * 0.7:
+                university = university_name(rng.randrange(100000))
+                sentences.append(f"{university} offers {rng.choice(PROGRAMS)} in {rng.choice(LOCATIONS)}, "
+                                 f"with guidance on {rng.choice(TOPICS)} for chunk {number}.")
+            paragraphs.append(" ".join(sentences))
+            number += 1
+        with open(f"scraped_data/bench_{file_number // chunks_per_file:06d}.txt", "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+def reset_vectorstore():
+    shutil.rmtree("vectorstore", ignore_errors=True)
+    shutil.rmtree(os.path.join("cache", "embeddings"), ignore_errors=True)
+
+def bench_indexing(index_type: str) -> Dict[str, Any]:
+    """Full build of the current corpus, then an incremental run with nothing changed"""
+    from data_indexer import load_and_index_data
+    reset_vectorstore()
+    started = time.time()
+    result = load_and_index_data(full=True, index_type=index_type)
+    build_seconds = time.time() - started
+    started = time.time()
+    load_and_index_data()
+    return {
+        "chunks": result.get("chunks"),
+        "seconds": round(build_seconds, 3),
+        "chunks_per_sec": result.get("chunks_per_sec"),
+        "timings": result.get("timings"),
+        "noop_incremental_seconds": round(time.time() - started, 3)
+    }
+
+def bench_load(processor) -> Dict[str, Any]:
+    started = time.time()
+    processor.load_faiss_index()
+    return {"seconds": round(time.time() - started, 4), "chunks": len(processor.text_chunks)}
+
+def search_queries(count: int, rng: random.Random) -> List[str]:
+    return [f"{rng.choice(TOPICS)} for {rng.choice(PROGRAMS)} at {university_name(rng.randrange(100000))}"
+            for _ in range(count)]
+
+def bench_search(processor, queries: List[str], truth: List[set] = None) -> Dict[str, Any]:
+    """Latency of single-query FAISS searches, and recall@k against exact search when available"""
+    from reranker import RAG_CANDIDATES
+    vectors = processor.embedding_model.encode(queries)
+    latencies, results = [], []
+    for vector in vectors:
+        started = time.time()
+        _, ids = processor.faiss_index.search(vector.reshape(1, -1), RAG_CANDIDATES)
+        latencies.append(time.time() - started)
+        results.append({int(chunk_id) for chunk_id in ids[0] if chunk_id >= 0})
+    report = {**percentiles(latencies), "qps": round(len(latencies) / sum(latencies), 1) if sum(latencies) else None}
+    if truth:
+        report[f"recall_at_{RAG_CANDIDATES}"] = round(
+            sum(len(found & exact) / max(len(exact), 1) for found, exact in zip(results, truth)) / len(truth), 4
+        )
+    return report, results
+
+def sql_queries(count: int, rows: int, rng: random.Random) -> List[str]:
+    """A mix of fast-path lookups, shapes Gemini answers with SQL, and questions SQL cannot answer"""
+    templates = [
+        lambda: f"What is the tuition at {university_name(rng.randrange(rows))}?",
+        lambda: f"Which universities offer {rng.choice(PROGRAMS)}?",
+        lambda: f"Where is {university_name(rng.randrange(rows))} located?",
+        lambda: f"Tell me about {rng.choice(TOPICS)}",
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+def bench_sql(processor, queries: List[str]) -> Dict[str, Any]:
+    latencies = []
+    answered = 0
+    for query in queries:
+        started = time.time()
+        result = processor.try_sql_query(query, "en", query)
+        latencies.append(time.time() - started)
+        answered += bool(result.get("success"))
+    return {**percentiles(latencies), "answered": answered, "plans": processor.sql_plan_cache.stats(),
+            "intents": processor.intent_matcher.stats()}
+
+def bench_chat(dispatcher, requests: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Send the requests through the dispatcher from `concurrency` client threads"""
+    from chat_processor import record_metrics
+    latencies, routes, errors = [], {}, 0
+    lock = threading.Lock()
+    
+    def send(request):
+        done = threading.Event()
+        started = time.time()
+        
+        def reply(result):
+            nonlocal errors
+            record_metrics(result)
+            with lock:
+                latencies.append(time.time() - started)
+                route = result.get("route", "error")
+                routes[route] = routes.get(route, 0) + 1
+                errors += not result.get("success", False)
+            done.set()
+        
+        dispatcher.submit(dict(request), reply)
+        done.wait()
+    
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(send, requests))
+    elapsed = time.time() - started
+    return {**percentiles(latencies), "throughput": round(len(requests) / elapsed, 2),
+            "seconds": round(elapsed, 3), "routes": routes, "errors": errors}
+
+def chat_requests(count: int, rows: int, foreign_ratio: float, rng: random.Random) -> List[Dict[str, Any]]:
+    queries = sql_queries(count, rows, rng)
+    return [{"message": query, "language": "es" if rng.random() < foreign_ratio else "en"} for query in queries]
+
+def bench_crawl(seeds: int) -> Dict[str, Any]:
+    """Crawl the seeds through the Tavily stand-in, then again with every page unchanged"""
+    from web_scraper import crawl, TavilyCrawlClient
+    client = TavilyCrawlClient()
+    urls = [f"https://bench-{number}.example.edu" for number in range(seeds)]
+    report = {}
+    for run in ("first", "unchanged"):
+        started = time.time()
+        result = crawl(client, urls, index=False, state_path=os.path.join("cache", "bench_crawl_state.json"))
+        report[run] = {"seconds": round(time.time() - started, 3),
+                       **{key: result[key] for key in ("pages", "written", "unchanged")}}
+    return report
+
+def commit_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def run(args) -> Dict[str, Any]:
+    only = set(args.only.split(","))
+    sizes = [int(size) for size in args.sizes.split(",")]
+    index_types = args.index_types.split(",")
+    # Exact search runs first so the approximate indexes can report recall against it
+    index_types.sort(key=lambda index_type: index_type != "flat")
+    rng = random.Random(args.seed)
+    results = {"indexing": {}, "load": {}, "search": {}}
+    
+    import data_indexer
+    from chat_processor import ChatProcessor, InlineDispatcher
+    write_universities(args.rows, rng)
+    processor = ChatProcessor(preload=True)
+    
+    if only & {"indexing", "load", "search"}:
+        for size in sizes:
+            print(f"Writing a {size}-chunk corpus", file=sys.stderr)
+            write_corpus(size, rng, data_indexer.CHUNK_SIZE)
+            queries = search_queries(args.search_queries, rng)
+            truth = None
+            for index_type in index_types:
+                key = f"{size}/{index_type}"
+                print(f"Building {key}", file=sys.stderr)
+                built = bench_indexing(index_type)
+                if "indexing" in only:
+                    results["indexing"][key] = built
+                loaded = bench_load(processor)
+                if "load" in only:
+                    results["load"][key] = loaded
+                if "search" in only:
+                    results["search"][key], found = bench_search(processor, queries, truth)
+                    if index_type == "flat":
+                        truth = found
+    
+    if "sql" in only:
+        print("Timing try_sql_query", file=sys.stderr)
+        results["sql"] = bench_sql(processor, sql_queries(args.sql_queries, args.rows, rng))
+    
+    if "chat" in only:
+        import tracing
+        if args.workers > 1:
+            from worker_pool import WorkerPool
+            dispatcher = WorkerPool(args.workers, args.requests, 600)
+        else:
+            dispatcher = InlineDispatcher(processor)
+        dispatcher.wait_ready()
+        results["chat"] = {}
+        try:
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                print(f"Timing process_query with {concurrency} concurrent clients", file=sys.stderr)
+                tracing.METRICS = tracing.Metrics()
+                requests = chat_requests(args.requests, args.rows, args.foreign_ratio, rng)
+                results["chat"][str(concurrency)] = {
+                    **bench_chat(dispatcher, requests, concurrency),
+                    "index_type": processor.index_meta.get("type") if processor.faiss_index else None,
+                    "stages": tracing.METRICS.summary()["stages"]
+                }
+        finally:
+            if hasattr(dispatcher, "shutdown"):
+                dispatcher.shutdown()
+    
+    if "crawl" in only:
+        print("Timing a concurrent crawl", file=sys.stderr)
+        results["crawl"] = bench_crawl(args.crawl_seeds)
+    
+    return {key: value for key, value in results.items() if value}
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="visamonk-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    info = commit_info()
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{(info['commit'] or 'nocommit')[:10]}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output = os.path.abspath(output)
+    
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = run(args)
+    finally:
+        os.chdir(cwd)
+        if not args.keep_workdir and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    report = {
+        **info,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": vars(args),
+        "results": results
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process"
+import path from "path"
+import readline from "readline"
+
+type Pending = {
+  onEvent?: (event: any) => void
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+  timer: NodeJS.Timeout
+}
+
+const REQUEST_TIMEOUT_MS = Number(process.env.CHAT_REQUEST_TIMEOUT_MS || 60000)
+// Warm worker processes behind the server, so concurrent users don't queue behind one Gemini call
+const CHAT_WORKERS = process.env.CHAT_WORKERS || "2"
+
+// A single warm chat_processor.py --serve process, with its worker pool, shared by all requests.
+// Kept on globalThis so Next.js hot reloads don't leak extra Python processes.
+class ChatWorker {
+  private child: ChildProcessWithoutNullStreams | null = null
+  private ready: Promise<void> | null = null
+  private pending = new Map<string, Pending>()
+  private nextId = 0
+
+  private start(): Promise<void> {
+    const pythonScript = path.join(process.cwd(), "scripts", "chat_processor.py")
+    const child = spawn("python3", [pythonScript, "--serve", "--workers", CHAT_WORKERS], {
+      env: { ...process.env, GOOGLE_API_KEY: process.env.GOOGLE_API_KEY },
+    })
+    this.child = child
+
+    this.ready = new Promise((resolve, reject) => {
+      const lines = readline.createInterface({ input: child.stdout })
+      lines.on("line", (line) => {
+        let message: any
+        try {
+          message = JSON.parse(line)
+        } catch {
+          console.error("Chat worker sent invalid output:", line)
+          return
+        }
+        if (message.event === "ready") {
+          resolve()
+          return
+        }
+        const pending = this.pending.get(message.id)
+        if (pending && message.type && message.type !== "done") {
+          // Intermediate streaming event; the request stays pending until "done"
+          const { id, ...event } = message
+          pending.onEvent?.(event)
+          return
+        }
+        if (pending) {
+          clearTimeout(pending.timer)
+          this.pending.delete(message.id)
+          const { id, ...result } = message
+          pending.resolve(result)
+        }
+      })
+
+      child.stderr.on("data", (data) => {
+        console.log(`[chat worker] ${data.toString().trimEnd()}`)
+      })
+
+      child.on("close", (code) => {
+        console.error(`Chat worker exited with code ${code}`)
+        this.child = null
+        this.ready = null
+        reject(new Error("Chat worker exited before becoming ready"))
+        for (const [id, pending] of this.pending) {
+          clearTimeout(pending.timer)
+          pending.reject(new Error("Chat worker exited"))
+          this.pending.delete(id)
+        }
+      })
+    })
+
+    return this.ready
+  }
+
+  async request(payload: Record<string, any>, onEvent?: (event: any) => void): Promise<any> {
+    if (!this.child || !this.ready) {
+      this.start()
+    }
+    await this.ready
+
+    const id = String(++this.nextId)
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id)
+        reject(new Error("Chat worker timed out"))
+      }, REQUEST_TIMEOUT_MS)
+      this.pending.set(id, { onEvent, resolve, reject, timer })
+      this.child!.stdin.write(JSON.stringify({ id, ...payload }) + "\n")
+    })
+  }
+}
+
+const globalForWorker = globalThis as unknown as { chatWorker?: ChatWorker }
+
+export function getChatWorker(): ChatWorker {
+  if (!globalForWorker.chatWorker) {
+    globalForWorker.chatWorker = new ChatWorker()
+  }
+  return globalForWorker.chatWorker
+}
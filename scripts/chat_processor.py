@@ -1,26 +1,91 @@
 #!/usr/bin/env python3
 import sys
 import json
-import sqlite3
 import os
+import sqlite3
 from typing import List, Dict, Any
-import google.generativeai as genai
-from deep_translator import GoogleTranslator
-from tavily import TavilyClient
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import pickle
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import datetime
-import pytz
 import time
+# Imported first so the import times below are measured from here
+import startup
+import tracing
+import threading
+from functools import cached_property
+# Gemini, Tavily, FAISS, sentence-transformers and the numpy-backed chunk store and
+# embedding cache are imported on first use
+import data_version
+import db
+from response_cache import ResponseCache
+from entity_vocabulary import EntityVocabulary
+from sql_plan_cache import SqlPlanCache
+from intent_matcher import IntentMatcher
+from lexical_index import LEXICAL_PATH, LexicalIndex
+from translation_service import TranslationService
+from conversation_logger import ConversationLogger
+from reranker import RAG_TOP_K, RAG_CANDIDATES, Reranker, reciprocal_rank_fusion
+from context_builder import build_context
+from request_coalescer import COALESCE_REQUESTS, RequestCoalescer
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+startup.record("imports", time.time() - startup.STARTED)
+
+# Threads shared by the pipeline stages of every request: SQL and retrieval overlap, plus one spare
+PIPELINE_THREADS = 4
+
+RAG_FALLBACK_TEXT = "I'm here to help with university and visa information. Please ask me about specific universities, programs, admission requirements, or visa processes."
+NO_INDEX_TEXT = "I'm here to help with university information! Please ask me about specific universities, programs, tuition fees, or visa requirements."
+RAG_ERROR_TEXT = "I encountered an error processing your query. Please try asking about specific universities, programs, or visa requirements."
+ERROR_TEXT = "I'm experiencing technical difficulties. Please try again or ask about universities, programs, or visa requirements."
+
+# Fixed start of every RAG prompt. It never varies between requests, so the provider can cache it;
+# the context, history and question all come after it.
+RAG_INSTRUCTIONS = """You are a helpful university and visa information assistant. Provide a concise and informative answer based on the context provided. If the answer isn't in the context, provide general guidance about university admissions and visa processes.
+
+Instructions:
+- Be helpful and informative
+- If specific information isn't available, provide general guidance
+- Keep responses concise but comprehensive
+- Focus on university admissions, programs, and visa requirements
+
+"""
+
+# Canned replies are never worth caching
+FALLBACK_TEXTS = {RAG_FALLBACK_TEXT, NO_INDEX_TEXT, RAG_ERROR_TEXT, ERROR_TEXT}
 
 class ChatProcessor:
-    def __init__(self):
-        self.setup_apis()
-        self.setup_database()
-        self.setup_embeddings()
+    def __init__(self, preload: bool = False):
+        """The embedding model and FAISS index load when RAG is first reached, or here with preload=True"""
+        # "async" overlaps SQL generation with retrieval; "serial" keeps the original SQL-then-RAG order
+        self.pipeline = os.getenv('CHAT_PIPELINE', 'async')
+        # One event loop and thread pool for the processor's lifetime, so stages run on long-lived
+        # threads that keep their pooled database connections and prepared statements
+        self.executor = ThreadPoolExecutor(max_workers=PIPELINE_THREADS, thread_name_prefix="chat-stage")
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        self.loop_lock = threading.Lock()
+        with startup.timed("response_cache"):
+            self.response_cache = ResponseCache()
+        with startup.timed("translator"):
+            self.translator = TranslationService()
+        with startup.timed("gemini"):
+            self.setup_apis()
+        with startup.timed("database"):
+            self.setup_database()
+            self.conversation_log = ConversationLogger(self.db_path)
+        with startup.timed("sql_caches"):
+            self.entity_vocabulary = EntityVocabulary(self.db_path)
+            self.sql_plan_cache = SqlPlanCache(self.db_path)
+            self.intent_matcher = IntentMatcher(self.entity_vocabulary)
+        
+        self.embedding_model = None
+        self.embedding_cache = None
+        self.faiss_index = None
+        self.text_chunks = []
+        self.lexical_index = None
+        self.embeddings_loaded = False
+        self.embeddings_lock = threading.Lock()
+        if preload:
+            self.ensure_embeddings(lazy=False)
     
     def setup_apis(self):
         """Initialize API clients"""
@@ -30,29 +95,35 @@ class ChatProcessor:
         try:
             if not self.genai_api_key:
                 raise ValueError("GOOGLE_API_KEY is not set")
+            import google.generativeai as genai
             genai.configure(api_key=self.genai_api_key)
             self.model = genai.GenerativeModel("gemini-1.5-flash")
             print("Gemini API initialized successfully", file=sys.stderr)
         except Exception as e:
             print(f"Error initializing Gemini API: {e}", file=sys.stderr)
             self.model = None
-        
+    
+    @cached_property
+    def tavily_client(self):
+        """Tavily client, created on first use"""
         try:
             if not self.tavily_api_key:
                 raise ValueError("TAVILY_API_KEY is not set")
-            self.tavily_client = TavilyClient(api_key=self.tavily_api_key)
+            from tavily import TavilyClient
+            client = TavilyClient(api_key=self.tavily_api_key)
             print("Tavily API initialized successfully", file=sys.stderr)
+            return client
         except Exception as e:
             print(f"Error initializing Tavily API: {e}", file=sys.stderr)
-            self.tavily_client = None
+            return None
     
     def setup_database(self):
         """Initialize SQLite database"""
         os.makedirs("data", exist_ok=True)
-        self.db_path = "data/chatbot.db"
+        self.db_path = db.DB_PATH
         
         if not os.path.exists(self.db_path):
-            conn = sqlite3.connect(self.db_path)
+            conn = db.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -85,13 +156,28 @@ class ChatProcessor:
             """)
             
             conn.commit()
-            conn.close()
             print("Database initialized with sample data", file=sys.stderr)
+        db.ensure_indexes(db.connect(self.db_path))
+    
+    def ensure_embeddings(self, lazy: bool = True) -> bool:
+        """Load the embedding model and FAISS index on first call; True if RAG can run"""
+        if not self.embeddings_loaded:
+            with self.embeddings_lock:
+                if not self.embeddings_loaded:
+                    with startup.timed("embeddings", lazy=lazy):
+                        self.setup_embeddings()
+                    self.embeddings_loaded = True
+        return bool(self.faiss_index and self.embedding_model)
     
     def setup_embeddings(self):
         """Initialize embedding model and FAISS index"""
         try:
+            from sentence_transformers import SentenceTransformer
+            from embedding_cache import EmbeddingCache
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_cache = EmbeddingCache('all-MiniLM-L6-v2')
+            self.reranker = Reranker()
+            self.reranker.load()
             self.load_faiss_index()
             print("Embeddings and FAISS index loaded successfully", file=sys.stderr)
         except Exception as e:
@@ -99,139 +185,492 @@ class ChatProcessor:
             self.embedding_model = None
             self.faiss_index = None
             self.text_chunks = []
+            self.lexical_index = None
     
     def load_faiss_index(self):
         """Load or create FAISS index"""
+        from chunk_store import ChunkStore, store_exists
         index_path = "vectorstore/index.faiss"
+        # Pickled chunks from indexes built before the chunk store
         chunks_path = "vectorstore/chunks.pkl"
+        self.index_version = data_version.read("vectorstore")
         
-        if os.path.exists(index_path) and os.path.exists(chunks_path):
-            self.faiss_index = faiss.read_index(index_path)
-            with open(chunks_path, 'rb') as f:
-                self.text_chunks = pickle.load(f)
+        if os.path.exists(index_path) and (store_exists("vectorstore") or os.path.exists(chunks_path)):
+            import faiss
+            self.index_meta = self.load_index_meta()
+            if os.getenv('FAISS_MMAP') == '1':
+                # Map the index read-only so pooled workers share the same pages
+                if self.index_meta.get("type", "flat").startswith("ivf"):
+                    io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                else:
+                    io_flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_READ_ONLY)
+                self.faiss_index = faiss.read_index(index_path, io_flags)
+            else:
+                self.faiss_index = faiss.read_index(index_path)
+            self.apply_search_params()
+            if store_exists("vectorstore"):
+                # Chunk texts stay on disk and are paged in only when retrieved
+                self.text_chunks = ChunkStore("vectorstore")
+            else:
+                import pickle
+                with open(chunks_path, 'rb') as f:
+                    self.text_chunks = pickle.load(f)
+            # BM25 over the same chunk ids, for exact names and codes embeddings miss
+            self.lexical_index = LexicalIndex(LEXICAL_PATH) if os.path.exists(LEXICAL_PATH) else None
             print(f"Loaded FAISS index with {len(self.text_chunks)} chunks", file=sys.stderr)
         else:
             self.faiss_index = None
             self.text_chunks = []
+            self.lexical_index = None
             print("No FAISS index found, using empty index", file=sys.stderr)
     
+    def load_index_meta(self) -> Dict[str, Any]:
+        """Parameters data_indexer.py stored with the index"""
+        meta_path = "vectorstore/index_meta.json"
+        if not os.path.exists(meta_path):
+            return {"type": "flat"}
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def apply_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Set IVF nprobe / HNSW efSearch from arguments, the environment, or the stored defaults"""
+        import faiss
+        index_type = self.index_meta.get("type", "flat")
+        parameters = faiss.ParameterSpace()
+        
+        if index_type.startswith("ivf"):
+            nprobe = nprobe or int(os.getenv('FAISS_NPROBE', self.index_meta.get("nprobe", 16)))
+            parameters.set_index_parameter(self.faiss_index, "nprobe", nprobe)
+            print(f"Searching {index_type} index with nprobe={nprobe}", file=sys.stderr)
+        elif index_type == "hnsw":
+            ef_search = ef_search or int(os.getenv('FAISS_EF_SEARCH', self.index_meta.get("ef_search", 64)))
+            parameters.set_index_parameter(self.faiss_index, "efSearch", ef_search)
+            print(f"Searching hnsw index with efSearch={ef_search}", file=sys.stderr)
+    
+    def refresh_index(self):
+        """Reload the FAISS index in a long-lived process once data_indexer.py has rebuilt it"""
+        if self.embedding_model and data_version.read("vectorstore") != self.index_version:
+            print("Vectorstore changed, reloading FAISS index", file=sys.stderr)
+            self.load_faiss_index()
+    
+    def embed_query(self, translated_query: str):
+        """Embed the English query once for both the response cache and FAISS.
+        None until RAG has loaded the model, so cache hits and SQL answers never wait for it."""
+        if not self.embedding_model:
+            return None
+        with tracing.span("embed"):
+            return self.embedding_cache.encode(self.embedding_model, [translated_query])
+    
+    def cached_response(self, query: str, language: str, translated_query: str, query_embedding) -> Dict[str, Any]:
+        """Answer from the response cache, or None on a miss"""
+        with tracing.span("cache_lookup"):
+            cached = self.response_cache.get(
+                translated_query, language,
+                query_embedding[0] if query_embedding is not None else None,
+                self.query_entities(translated_query)
+            )
+        if not cached:
+            return None
+        print("Response cache hit", file=sys.stderr)
+        return {**cached, "followUps": self.generate_follow_ups(query)}
+    
+    def remember_response(self, translated_query: str, language: str, text: str, query_embedding, english_text: str = None):
+        """Cache a real SQL or RAG answer (never the canned fallbacks).
+        Pass the English text of a translated answer: a translated fallback no longer matches FALLBACK_TEXTS."""
+        if text and (english_text if english_text is not None else text) not in FALLBACK_TEXTS:
+            self.response_cache.put(
+                translated_query, language, {"success": True, "text": text},
+                query_embedding[0] if query_embedding is not None else None,
+                self.query_entities(translated_query)
+            )
+    
+    def query_entities(self, translated_query: str) -> frozenset:
+        """Universities, programs and locations a query names; similar cached questions must name the same ones"""
+        return frozenset((entity["column"], entity["value"]) for entity in self.entity_vocabulary.find(translated_query))
+    
     def process_query(self, query: str, language: str = "en", history: List[Dict] = None) -> Dict[str, Any]:
         """Main query processing function"""
+        # Stages below record their spans on this trace, including those run on executor threads
+        tracing.start()
+        if self.pipeline == "async":
+            return self.run_async(self.process_query_async(query, language, history))
+        
         start_time = time.time()
+        timings = {}
         print(f"Processing query: {query}", file=sys.stderr)
+        self.refresh_index()
         
         try:
+            # Translate once and share it between the cache, SQL and RAG attempts
+            stage = time.time()
+            translated_query = self.translate_query(query, language)
+            stage = lap(timings, "translate", stage)
+            query_embedding = self.embed_query(translated_query)
+            stage = lap(timings, "embed", stage)
+            cached = self.cached_response(query, language, translated_query, query_embedding)
+            if cached:
+                return with_route(cached, "cache", timings, start_time)
+            
             # Try SQL query first
-            sql_response = self.try_sql_query(query, language)
+            sql_response = self.try_sql_query(query, language, translated_query)
+            stage = lap(timings, "sql", stage)
             if sql_response["success"]:
                 print(f"SQL query successful, took: {time.time() - start_time:.2f}s", file=sys.stderr)
-                return sql_response
+                self.remember_response(translated_query, language, sql_response["text"], query_embedding)
+                return with_route(sql_response, "sql", timings, start_time)
             
             # Fall back to RAG query
-            rag_response = self.try_rag_query(query, language, history)
+            rag_response = self.try_rag_query(query, language, history, translated_query, query_embedding)
+            lap(timings, "rag", stage)
             print(f"RAG query successful, took: {time.time() - start_time:.2f}s", file=sys.stderr)
-            return rag_response
+            return with_route(rag_response, "rag", timings, start_time)
+        
+        except Exception as e:
+            print(f"Error processing query: {e}", file=sys.stderr)
+            return with_route(self.error_response(query), "error", timings, start_time)
+    
+    def run_async(self, coroutine):
+        """Run a coroutine on the processor's loop, then finish the tasks it cancelled"""
+        with self.loop_lock:
+            try:
+                return self.loop.run_until_complete(coroutine)
+            finally:
+                leftover = asyncio.all_tasks(self.loop)
+                for task in leftover:
+                    task.cancel()
+                if leftover:
+                    self.loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+    
+    async def process_query_async(self, query: str, language: str = "en", history: List[Dict] = None) -> Dict[str, Any]:
+        """Run SQL generation and FAISS retrieval concurrently, generating a RAG answer only on a SQL miss"""
+        start_time = time.time()
+        timings = {}
+        print(f"Processing query: {query}", file=sys.stderr)
+        
+        self.refresh_index()
+        
+        rag_task = None
+        try:
+            stage = time.time()
+            translated_query = await asyncio.to_thread(self.translate_query, query, language)
+            stage = lap(timings, "translate", stage)
+            query_embedding = await asyncio.to_thread(self.embed_query, translated_query)
+            stage = lap(timings, "embed", stage)
+            cached = self.cached_response(query, language, translated_query, query_embedding)
+            if cached:
+                return with_route(cached, "cache", timings, start_time)
+            
+            # Retrieval starts speculatively; generation waits until SQL has missed
+            sql_missed = asyncio.Event()
+            rag_task = asyncio.create_task(
+                self.rag_branch(query, language, history, translated_query, query_embedding, sql_missed)
+            )
+            
+            try:
+                sql_result = await asyncio.to_thread(self.run_sql_query, translated_query)
+            except Exception as e:
+                print(f"SQL query error: {e}", file=sys.stderr)
+                sql_result = {"success": False, "error": str(e)}
+            stage = lap(timings, "sql", stage)
             
+            if sql_result["success"]:
+                rag_task.cancel()
+                response = await asyncio.to_thread(self.translate_response, sql_result["text"], language)
+                lap(timings, "translate_response", stage)
+                print(f"SQL query successful, took: {time.time() - start_time:.2f}s", file=sys.stderr)
+                self.remember_response(translated_query, language, response, query_embedding)
+                return with_route({
+                    "success": True,
+                    "text": response,
+                    "followUps": self.generate_follow_ups(query)
+                }, "sql", timings, start_time)
+            
+            # Retrieval has been running alongside SQL; this is the time left for it and generation
+            sql_missed.set()
+            rag_response = await rag_task
+            lap(timings, "rag", stage)
+            print(f"RAG query successful, took: {time.time() - start_time:.2f}s", file=sys.stderr)
+            return with_route(rag_response, "rag", timings, start_time)
+        
         except Exception as e:
+            if rag_task:
+                rag_task.cancel()
             print(f"Error processing query: {e}", file=sys.stderr)
+            return with_route(self.error_response(query), "error", timings, start_time)
+    
+    async def rag_branch(self, query: str, language: str, history: List[Dict], translated_query: str, query_embedding, sql_missed: asyncio.Event) -> Dict[str, Any]:
+        """RAG half of the async pipeline, cancelled as soon as SQL returns rows"""
+        try:
+            if not self.embeddings_loaded:
+                # Cold process: the model is only loaded once SQL has missed
+                await sql_missed.wait()
+            if not await asyncio.to_thread(self.ensure_embeddings):
+                await sql_missed.wait()
+                print("No FAISS index available, returning fallback response", file=sys.stderr)
+                return self.no_index_response(query)
+            
+            context = await asyncio.to_thread(self.retrieve_context, translated_query, query_embedding)
+            await sql_missed.wait()
+            
+            if not self.model:
+                print("Gemini API not available, returning fallback response", file=sys.stderr)
+                return self.rag_error_response(query)
+            english_response = await asyncio.to_thread(self.generate_rag_response, translated_query, context, history)
+            response = await asyncio.to_thread(self.translate_response, english_response, language)
+            self.remember_response(translated_query, language, response, query_embedding, english_response)
             return {
-                "success": False,
-                "text": "I'm experiencing technical difficulties. Please try again or ask about universities, programs, or visa requirements.",
+                "success": True,
+                "text": response,
                 "followUps": self.generate_follow_ups(query)
             }
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"RAG query error: {e}", file=sys.stderr)
+            return self.rag_error_response(query)
     
-    def try_sql_query(self, query: str, language: str) -> Dict[str, Any]:
-        """Attempt to answer query using SQL database"""
-        sql_start = time.time()
+    def process_query_stream(self, query: str, language: str = "en", history: List[Dict] = None):
+        """Yield streaming events: the retrieved sources, text deltas, then followUps and timing"""
+        start_time = time.time()
+        tracing.start()
+        print(f"Processing streamed query: {query}", file=sys.stderr)
+        
+        self.refresh_index()
+        
+        parts = []
+        # Untranslated RAG text, which decides whether the answer is a fallback
+        english_parts = []
+        first_delta_at = None
+        success = True
+        route = "rag"
         try:
-            # Translate query to English if needed
-            if language != "en":
-                translated_query = GoogleTranslator(source=language, target="en").translate(query)
-            else:
-                translated_query = query
-            print(f"Translated query: {translated_query}", file=sys.stderr)
+            translated_query = self.translate_query(query, language)
+            query_embedding = self.embed_query(translated_query)
+            cached = self.cached_response(query, language, translated_query, query_embedding)
             
-            # Generate SQL query using Gemini
-            if not self.model:
-                return {"success": False, "error": "Gemini API not available"}
-            sql_query = self.generate_sql_query(translated_query)
-            print(f"Generated SQL query: {sql_query}", file=sys.stderr)
+            # Retrieval runs speculatively while SQL is generated, as in the async pipeline
+            retrieval = None
+            if not cached and self.embeddings_loaded and self.ensure_embeddings():
+                retrieval = self.executor.submit(tracing.in_context(self.retrieve_chunks), translated_query, query_embedding)
             
-            if not sql_query.startswith('SELECT'):
-                return {"success": False, "error": "Invalid SQL query generated"}
+            if cached:
+                sql_result = {"success": False}
+            else:
+                try:
+                    sql_result = self.run_sql_query(translated_query)
+                except Exception as e:
+                    print(f"SQL query error: {e}", file=sys.stderr)
+                    sql_result = {"success": False, "error": str(e)}
             
-            # Execute SQL query
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            conn.close()
-            print(f"SQL query executed, results: {len(results)}, took: {time.time() - sql_start:.2f}s", file=sys.stderr)
+            if cached:
+                route = "cache"
+                yield {"type": "sources", "route": route, "sources": []}
+                deltas = [cached["text"]]
+            elif sql_result["success"]:
+                route = "sql"
+                if retrieval:
+                    retrieval.cancel()
+                yield {"type": "sources", "route": route, "sources": []}
+                deltas = [self.translate_response(sql_result["text"], language)]
+            elif retrieval is None and not self.ensure_embeddings():
+                yield {"type": "sources", "route": route, "sources": []}
+                deltas = [self.no_index_response(query)["text"]]
+            else:
+                chunks = retrieval.result() if retrieval else self.retrieve_chunks(translated_query, query_embedding)
+                yield {
+                    "type": "sources",
+                    "route": route,
+                    "sources": [
+                        {"id": chunk["id"], "distance": chunk["distance"], "source": chunk.get("source"), "preview": chunk["text"][:200]}
+                        for chunk in chunks
+                    ]
+                }
+                if not self.model:
+                    deltas = [self.rag_error_response(query)["text"]]
+                else:
+                    context = build_context(chunks)
+                    deltas = self.translate_stream(
+                        recorded(self.generate_rag_response_stream(translated_query, context, history), english_parts),
+                        language
+                    )
             
-            if not results:
-                return {"success": False, "error": "No results found"}
+            for delta in deltas:
+                if not delta:
+                    continue
+                if first_delta_at is None:
+                    first_delta_at = time.time()
+                parts.append(delta)
+                yield {"type": "delta", "text": delta}
             
-            # Format response
-            if len(results) == 1 and len(columns) == 1:
-                response = str(results[0][0])
-            else:
-                response = "\n".join([
-                    f"{', '.join([f'{col}: {val}' for col, val in zip(columns, row)])}" 
-                    for row in results
-                ])
+            if route != "cache":
+                self.remember_response(translated_query, language, "".join(parts), query_embedding,
+                                       "".join(english_parts) if english_parts else None)
+        
+        except Exception as e:
+            print(f"Error processing streamed query: {e}", file=sys.stderr)
+            success = False
+            if not parts:
+                error_text = self.error_response(query)["text"]
+                parts.append(error_text)
+                yield {"type": "delta", "text": error_text}
+        
+        total = time.time() - start_time
+        print(f"Streamed {route} response, took: {total:.2f}s", file=sys.stderr)
+        yield {
+            "type": "done",
+            "success": success,
+            "route": route,
+            "text": "".join(parts),
+            "followUps": self.generate_follow_ups(query),
+            "timing": {
+                "first_delta": round(first_delta_at - start_time, 3) if first_delta_at else None,
+                **tracing.spans(),
+                "total": round(total, 3)
+            }
+        }
+    
+    def translate_stream(self, deltas, language: str):
+        """Translate streamed English text back a sentence at a time"""
+        if language == "en":
+            yield from deltas
+            return
+        
+        buffer = ""
+        for delta in deltas:
+            buffer += delta
+            # Translate only whole sentences so the translator sees complete context
+            boundary = max(buffer.rfind(". "), buffer.rfind("! "), buffer.rfind("? "), buffer.rfind("\n"))
+            if boundary > 0:
+                complete, buffer = buffer[:boundary + 1], buffer[boundary + 1:].lstrip()
+                yield self.translate_response(complete, language) + " "
+        if buffer.strip():
+            yield self.translate_response(buffer, language)
+    
+    def translate_query(self, query: str, language: str) -> str:
+        """Translate the user's query to English if needed"""
+        with tracing.span("translate"):
+            translated_query = self.translator.translate(query, language, "en")
+        print(f"Translated query: {translated_query}", file=sys.stderr)
+        return translated_query
+    
+    def translate_response(self, response: str, language: str) -> str:
+        """Translate an English response back to the user's language if needed"""
+        with tracing.span("translate_response"):
+            return self.translator.translate(response, "en", language)
+    
+    def try_sql_query(self, query: str, language: str, translated_query: str = None) -> Dict[str, Any]:
+        """Attempt to answer query using SQL database"""
+        try:
+            if translated_query is None:
+                translated_query = self.translate_query(query, language)
             
-            # Translate response back if needed
-            if language != "en":
-                response = GoogleTranslator(source="en", target=language).translate(response)
+            sql_result = self.run_sql_query(translated_query)
+            if not sql_result["success"]:
+                return sql_result
             
             return {
                 "success": True,
-                "text": response,
+                "text": self.translate_response(sql_result["text"], language),
                 "followUps": self.generate_follow_ups(query)
             }
-            
+        
         except Exception as e:
             print(f"SQL query error: {e}", file=sys.stderr)
             return {"success": False, "error": str(e)}
     
-    def try_rag_query(self, query: str, language: str, history: List[Dict] = None) -> Dict[str, Any]:
+    def run_sql_query(self, translated_query: str) -> Dict[str, Any]:
+        """Generate and execute SQL for an English query, formatting any rows as text"""
+        sql_start = time.time()
+        
+        entities = self.entity_vocabulary.find(translated_query)
+        
+        # Common lookups are answered straight from the table without Gemini
+        fast_path = self.intent_matcher.match(translated_query, entities)
+        if fast_path:
+            print(f"Intent fast path ({fast_path['intent']}, confidence {fast_path['confidence']:.2f}): {fast_path['sql']}", file=sys.stderr)
+            result = self.execute_sql(fast_path["sql"], fast_path["params"], sql_start)
+            if result["success"]:
+                return result
+        
+        # Reuse a cached template when this query has the same shape as an earlier one
+        signature, lifted = self.sql_plan_cache.signature(translated_query, entities)
+        plan = self.sql_plan_cache.lookup(signature, lifted)
+        learned = plan is None
+        
+        if learned:
+            # Generate SQL query using Gemini
+            if not self.model:
+                return {"success": False, "error": "Gemini API not available"}
+            with tracing.span("sql_generate"):
+                sql_query = self.generate_sql_query(translated_query)
+            print(f"Generated SQL query: {sql_query}", file=sys.stderr)
+            
+            if not sql_query.startswith('SELECT'):
+                if sql_query:
+                    self.sql_plan_cache.remember_miss(signature)
+                return {"success": False, "error": "Invalid SQL query generated"}
+            plan = self.sql_plan_cache.learn(signature, lifted, sql_query)
+        elif plan["sql"] is None:
+            return {"success": False, "error": "No SQL for this query shape"}
+        else:
+            print(f"SQL plan cache hit for '{signature}': {plan['sql']}", file=sys.stderr)
+        
+        try:
+            result = self.execute_sql(plan["sql"], plan["params"], sql_start)
+        except sqlite3.Error:
+            # A plan is only worth keeping once its SQL has run
+            if not learned:
+                self.sql_plan_cache.forget(signature)
+            raise
+        if learned:
+            self.sql_plan_cache.store(signature, plan)
+        return result
+    
+    def execute_sql(self, sql_query: str, params: List[Any], sql_start: float) -> Dict[str, Any]:
+        """Execute a SELECT with bound parameters and format the rows as text"""
+        # Generated SQL runs on a read-only connection, so it can never modify the database
+        with tracing.span("sql_exec"):
+            cursor = db.connect(self.db_path, read_only=True).cursor()
+            cursor.execute(sql_query, params)
+            results = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            cursor.close()
+        print(f"SQL query executed, results: {len(results)}, took: {time.time() - sql_start:.2f}s", file=sys.stderr)
+        
+        if not results:
+            return {"success": False, "error": "No results found"}
+        
+        # Format response
+        if len(results) == 1 and len(columns) == 1:
+            response = str(results[0][0])
+        else:
+            response = "\n".join([
+                f"{', '.join([f'{col}: {val}' for col, val in zip(columns, row)])}" 
+                for row in results
+            ])
+        
+        return {"success": True, "text": response}
+    
+    def try_rag_query(self, query: str, language: str, history: List[Dict] = None, translated_query: str = None, query_embedding=None) -> Dict[str, Any]:
         """Attempt to answer query using RAG"""
         rag_start = time.time()
         try:
-            if not self.faiss_index or not self.embedding_model:
+            if not self.ensure_embeddings():
                 print("No FAISS index available, returning fallback response", file=sys.stderr)
-                return {
-                    "success": True,
-                    "text": "I'm here to help with university information! Please ask me about specific universities, programs, tuition fees, or visa requirements.",
-                    "followUps": self.generate_follow_ups(query)
-                }
-            
-            # Translate query to English if needed
-            if language != "en":
-                translated_query = GoogleTranslator(source=language, target="en").translate(query)
-            else:
-                translated_query = query
+                return self.no_index_response(query)
             
-            # Get relevant documents using FAISS
-            query_embedding = self.embedding_model.encode([translated_query])
-            distances, indices = self.faiss_index.search(query_embedding, k=3)
-            print(f"FAISS search returned {len(indices[0])} results, took: {time.time() - rag_start:.2f}s", file=sys.stderr)
+            if translated_query is None:
+                translated_query = self.translate_query(query, language)
             
-            # Get context from retrieved chunks
-            context = ""
-            for idx in indices[0]:
-                if idx < len(self.text_chunks):
-                    context += self.text_chunks[idx] + "\n\n"
+            context = self.retrieve_context(translated_query, query_embedding)
             
             # Generate response using Gemini
             if not self.model:
-                return {"success": False, "error": "Gemini API not available"}
-            response = self.generate_rag_response(translated_query, context, history)
-            
-            # Translate response back if needed
-            if language != "en":
-                response = GoogleTranslator(source="en", target=language).translate(response)
+                print("Gemini API not available, returning fallback response", file=sys.stderr)
+                return self.rag_error_response(query)
+            english_response = self.generate_rag_response(translated_query, context, history)
+            response = self.translate_response(english_response, language)
+            self.remember_response(translated_query, language, response, query_embedding, english_response)
             
             print(f"RAG response generated, took: {time.time() - rag_start:.2f}s", file=sys.stderr)
             return {
@@ -239,14 +678,73 @@ class ChatProcessor:
                 "text": response,
                 "followUps": self.generate_follow_ups(query)
             }
-            
+        
         except Exception as e:
             print(f"RAG query error: {e}", file=sys.stderr)
-            return {
-                "success": True,
-                "text": "I encountered an error processing your query. Please try asking about specific universities, programs, or visa requirements.",
-                "followUps": self.generate_follow_ups(query)
-            }
+            return self.rag_error_response(query)
+    
+    def retrieve_chunks(self, translated_query: str, query_embedding=None) -> List[Dict[str, Any]]:
+        """Fuse FAISS and BM25 candidates, rerank them if a reranker is configured, and return the top RAG_TOP_K"""
+        search_start = time.time()
+        if query_embedding is None:
+            query_embedding = self.embed_query(translated_query)
+        with tracing.span("faiss_search"):
+            distances, indices = self.faiss_index.search(query_embedding, k=RAG_CANDIDATES)
+        distance_by_id = {int(idx): float(distance) for distance, idx in zip(distances[0], indices[0]) if idx >= 0}
+        with tracing.span("lexical_search"):
+            lexical_ids = self.lexical_index.search(translated_query, RAG_CANDIDATES) if self.lexical_index else []
+        fused = reciprocal_rank_fusion([list(distance_by_id), lexical_ids])
+        print(f"Hybrid search fused {len(distance_by_id)} vector and {len(lexical_ids)} lexical results, "
+              f"took: {time.time() - search_start:.2f}s", file=sys.stderr)
+        
+        # The reranker sees a wider pool than the final context
+        pool_size = RAG_CANDIDATES if self.reranker.enabled else RAG_TOP_K
+        chunks = []
+        for chunk_id, score in fused:
+            if len(chunks) >= pool_size:
+                break
+            text = self.chunk_text(chunk_id)
+            if text is not None:
+                chunk = {"id": chunk_id, "distance": distance_by_id.get(chunk_id), "score": score, "text": text}
+                # Chunk store entries carry their source and position; legacy pickles don't
+                if hasattr(self.text_chunks, "metadata"):
+                    chunk.update(self.text_chunks.metadata(chunk_id))
+                chunks.append(chunk)
+        with tracing.span("rerank"):
+            return self.reranker.rerank(translated_query, chunks, RAG_TOP_K)
+    
+    def chunk_text(self, chunk_id: int) -> str:
+        """Text of a chunk by FAISS id (from the chunk store, or a pickled dict or list from older indexes)"""
+        if hasattr(self.text_chunks, "get"):
+            return self.text_chunks.get(chunk_id)
+        if 0 <= chunk_id < len(self.text_chunks):
+            return self.text_chunks[chunk_id]
+        return None
+    
+    def retrieve_context(self, translated_query: str, query_embedding=None) -> str:
+        """Build a prompt context from the closest chunks"""
+        return build_context(self.retrieve_chunks(translated_query, query_embedding))
+    
+    def no_index_response(self, query: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "text": NO_INDEX_TEXT,
+            "followUps": self.generate_follow_ups(query)
+        }
+    
+    def rag_error_response(self, query: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "text": RAG_ERROR_TEXT,
+            "followUps": self.generate_follow_ups(query)
+        }
+    
+    def error_response(self, query: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "text": ERROR_TEXT,
+            "followUps": self.generate_follow_ups(query)
+        }
     
     def generate_sql_query(self, query: str) -> str:
         """Generate SQL query using Gemini"""
@@ -275,41 +773,52 @@ class ChatProcessor:
             return response.text.strip()
         except Exception as e:
             print(f"Error generating SQL: {e}", file=sys.stderr)
-            return f"No relevant data in database."
+            return ""
+    
+    def build_rag_prompt(self, query: str, context: str, history: List[Dict] = None) -> str:
+        """Build the RAG prompt: the fixed instructions, then recent user turns, retrieved context and the question"""
+        prompt = RAG_INSTRUCTIONS
+        if history:
+            previous = [msg.get('content', '') for msg in history[-3:] if msg.get('type') == 'user']
+            if previous:
+                prompt += "Previous questions:\n" + "\n".join(previous) + "\n\n"
+        return f"{prompt}Context:\n{context}\n\nQuestion: {query}\n\nAnswer:"
     
     def generate_rag_response(self, query: str, context: str, history: List[Dict] = None) -> str:
         """Generate response using RAG with Gemini"""
-        history_context = ""
-        if history:
-            history_context = "\n".join([
-                f"Previous Q: {msg.get('content', '')}" 
-                for msg in history[-3:] if msg.get('type') == 'user'
-            ])
-        
-        full_context = f"{history_context}\n\n{context}" if history_context else context
-        
-        prompt = f"""
-        You are a helpful university and visa information assistant. Provide a concise and informative answer based on the context provided. If the answer isn't in the context, provide general guidance about university admissions and visa processes.
-        
-        Context: {full_context}
-        
-        Question: {query}
-        
-        Instructions:
-        - Be helpful and informative
-        - If specific information isn't available, provide general guidance
-        - Keep responses concise but comprehensive
-        - Focus on university admissions, programs, and visa requirements
-        
-        Answer:
-        """
+        prompt = self.build_rag_prompt(query, context, history)
         
         try:
-            response = self.model.generate_content(prompt)
+            with tracing.span("llm_generate"):
+                response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
             print(f"Error generating RAG response: {e}", file=sys.stderr)
-            return "I'm here to help with university and visa information. Please ask me about specific universities, programs, admission requirements, or visa processes."
+            return RAG_FALLBACK_TEXT
+    
+    def generate_rag_response_stream(self, query: str, context: str, history: List[Dict] = None):
+        """Yield the RAG response from Gemini as text chunks arrive"""
+        prompt = self.build_rag_prompt(query, context, history)
+        
+        produced = False
+        # Time spent waiting on Gemini, not on the consumer of the yielded text
+        waiting = 0.0
+        try:
+            started = time.time()
+            for chunk in self.model.generate_content(prompt, stream=True):
+                waiting += time.time() - started
+                text = chunk.text
+                if text:
+                    produced = True
+                    yield text
+                started = time.time()
+            waiting += time.time() - started
+        except Exception as e:
+            print(f"Error streaming RAG response: {e}", file=sys.stderr)
+            if not produced:
+                yield RAG_FALLBACK_TEXT
+        finally:
+            tracing.add("llm_generate", waiting)
     
     def generate_follow_ups(self, query: str) -> List[str]:
         """Generate follow-up questions"""
@@ -325,21 +834,262 @@ class ChatProcessor:
         import random
         return random.sample(follow_ups, min(3, len(follow_ups)))
     
-    def save_conversation(self, query: str, response: str):
-        """Save conversation to database"""
+    def save_conversation(self, query: str, response: str, language: str = None, route: str = None, timings: Dict[str, Any] = None):
+        """Queue the conversation for the background logger so the response isn't held up by the insert"""
+        self.conversation_log.log(query, response, language, route, timings)
+
+def lap(timings: Dict[str, float], stage: str, started: float) -> float:
+    """Record the seconds since `started` under `stage` and return the current time"""
+    now = time.time()
+    timings[stage] = round(now - started, 3)
+    return now
+
+def recorded(chunks, into: List[str]):
+    """Pass chunks through, keeping a copy of each in into"""
+    for chunk in chunks:
+        into.append(chunk)
+        yield chunk
+
+def with_route(result: Dict[str, Any], route: str, timings: Dict[str, float], start_time: float) -> Dict[str, Any]:
+    """Tag a result with the route that answered it (cache, sql, rag or error) and its stage timings"""
+    # Fine-grained spans from the trace join the pipeline's own phases
+    timings.update(tracing.spans())
+    lap(timings, "total", start_time)
+    return {**result, "route": route, "timings": timings}
+
+def handle_chat(processor: ChatProcessor, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer one chat request on a warm processor"""
+    result = processor.process_query(
+        request['message'],
+        request.get('language', 'en'),
+        request.get('history', [])
+    )
+    started = time.time()
+    if result.get('text'):
+        processor.save_conversation(request['message'], result['text'], request.get('language', 'en'),
+                                    result.get('route'), result.get('timings'))
+    if result.get('timings') is not None:
+        lap(result['timings'], "save_conversation", started)
+    return result
+
+def stream_chat(processor: ChatProcessor, request: Dict[str, Any], emit):
+    """Emit streaming events for one chat request, saving the finished answer"""
+    for event in processor.process_query_stream(
+        request['message'],
+        request.get('language', 'en'),
+        request.get('history', [])
+    ):
+        if event["type"] == "done" and event.get('text'):
+            started = time.time()
+            processor.save_conversation(request['message'], event['text'], request.get('language', 'en'),
+                                        event['route'], event['timing'])
+            lap(event['timing'], "save_conversation", started)
+        emit(event)
+
+def readiness(processor: ChatProcessor) -> Dict[str, Any]:
+    """Report which components of a warm processor are loaded"""
+    return {
+        "ready": True,
+        "model": processor.model is not None,
+        "embedding_model": processor.embedding_model is not None,
+        "faiss_index": processor.faiss_index is not None,
+        "chunks": len(processor.text_chunks),
+        "cache": processor.response_cache.stats(),
+        "sql_plans": processor.sql_plan_cache.stats(),
+        "intents": processor.intent_matcher.stats(),
+        "embeddings": processor.embedding_cache.stats() if processor.embedding_cache else None,
+        "translations": processor.translator.stats(),
+        "conversation_log": processor.conversation_log.stats(),
+        "startup": startup.report(),
+        "pid": os.getpid()
+    }
+
+class InlineDispatcher:
+    """Serve chats on a single warm processor, one at a time"""
+    
+    def __init__(self, processor: ChatProcessor):
+        import threading
+        self.processor = processor
+        self.lock = threading.Lock()
+    
+    def wait_ready(self, timeout: float = None) -> bool:
+        return True
+    
+    def submit(self, request: Dict[str, Any], reply):
+        with self.lock:
+            try:
+                if request.get('stream'):
+                    stream_chat(self.processor, request, reply)
+                    return
+                result = handle_chat(self.processor, request)
+            except Exception as e:
+                print(f"Server error: {e}", file=sys.stderr)
+                result = {"success": False, "error": str(e), "text": ERROR_TEXT}
+                if request.get('stream'):
+                    result["type"] = "done"
+        reply(result)
+    
+    def status(self) -> Dict[str, Any]:
+        return readiness(self.processor)
+    
+    def shutdown(self):
+        """Write out conversations still waiting in the logger"""
+        self.processor.conversation_log.close()
+
+def record_metrics(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Add a finished chat's stage timings to the latency histograms; streamed deltas pass through"""
+    timings = result.get("timing") if result.get("type") == "done" else result.get("timings")
+    if timings and result.get("route"):
+        tracing.METRICS.observe(result["route"], timings)
+    return result
+
+class Server:
+    """Line-delimited JSON front end shared by the stdio and socket transports"""
+    
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.started_at = time.time()
+        self.received = 0
+        self.coalescer = None
+        # Followers never reach a worker, so their conversations are logged here, by a logger created
+        # on the first follower so servers that never coalesce don't open a second writer
+        self.conversation_log = None
+        self.log_lock = threading.Lock()
+        # Chats run on their own threads, so probes and later lines are read while one is answered
+        self.chats = set()
+        self.chats_lock = threading.Lock()
+        if COALESCE_REQUESTS:
+            self.coalescer = RequestCoalescer(dispatcher.submit, self.log_follower)
+    
+    def log_follower(self, request: Dict[str, Any], result: Dict[str, Any]):
+        """Queue the conversation of a request answered with another request's result"""
+        if not result.get('text'):
+            return
+        with self.log_lock:
+            if self.conversation_log is None:
+                os.makedirs(os.path.dirname(db.DB_PATH) or ".", exist_ok=True)
+                self.conversation_log = ConversationLogger(db.DB_PATH)
+        self.conversation_log.log(request['message'], result['text'], request.get('language', 'en'),
+                                  result.get('route'), result.get('timing') or result.get('timings'))
+    
+    def handle_line(self, line: str, reply):
+        """Parse one request line and route it, replying with the request id attached"""
+        request_id = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            timestamp = datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute(
-                "INSERT INTO conversation_history (query, response, timestamp) VALUES (?, ?, ?)",
-                (query, response, timestamp)
-            )
-            conn.commit()
-            conn.close()
-            print("Conversation saved to database", file=sys.stderr)
+            request = json.loads(line)
+            request_id = request.get('id')
+            op = request.get('op', 'chat')
         except Exception as e:
-            print(f"Error saving conversation: {e}", file=sys.stderr)
+            reply({"id": request_id, "success": False, "error": str(e)})
+            return
+        
+        self.received += 1
+        respond = lambda result: reply({"id": request_id, **result})
+        
+        if op == 'health':
+            respond({"status": "ok", "uptime": round(time.time() - self.started_at, 3), "received": self.received})
+        elif op == 'ready':
+            status = self.dispatcher.status()
+            if self.coalescer:
+                status["coalescing"] = self.coalescer.stats()
+            respond(status)
+        elif op == 'metrics':
+            respond({"summary": tracing.METRICS.summary(), "prometheus": tracing.METRICS.prometheus()})
+        elif op == 'chat':
+            thread = threading.Thread(target=self.run_chat, args=(request, respond), daemon=True)
+            with self.chats_lock:
+                self.chats.add(thread)
+            thread.start()
+        else:
+            respond({"success": False, "error": f"Unknown op: {op}"})
+    
+    def run_chat(self, request: Dict[str, Any], respond):
+        try:
+            submit = self.coalescer.submit if self.coalescer else self.dispatcher.submit
+            # Results pass through here from every worker, so the histograms cover the whole server
+            submit(request, lambda result: respond(record_metrics(result)))
+        except Exception as e:
+            print(f"Server error: {e}", file=sys.stderr)
+            result = {"success": False, "error": str(e), "text": ERROR_TEXT}
+            if request.get('stream'):
+                result["type"] = "done"
+            respond(result)
+        finally:
+            with self.chats_lock:
+                self.chats.discard(threading.current_thread())
+    
+    def drain(self):
+        """Wait for chats still being answered"""
+        with self.chats_lock:
+            chats = list(self.chats)
+        for thread in chats:
+            thread.join()
+
+def wait_for_dispatcher(dispatcher, timeout: float):
+    """Exit with an error when the workers can't finish loading within timeout seconds"""
+    if not dispatcher.wait_ready(timeout):
+        waited = f" within {timeout:g}s" if timeout is not None else ""
+        print(f"Chat workers did not become ready{waited}, exiting", file=sys.stderr)
+        sys.exit(1)
+
+def serve_stdio(dispatcher, ready_timeout: float = None):
+    """Serve line-delimited JSON requests on stdin/stdout until EOF"""
+    import threading
+    
+    server = Server(dispatcher)
+    write_lock = threading.Lock()
+    
+    def write(message: Dict[str, Any]):
+        with write_lock:
+            print(json.dumps(message), flush=True)
+    
+    wait_for_dispatcher(dispatcher, ready_timeout)
+    write({"event": "ready", **dispatcher.status()})
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            server.handle_line(line, write)
+    server.drain()
+
+def serve_socket(dispatcher, socket_path: str, ready_timeout: float = None):
+    """Serve line-delimited JSON requests on a local Unix socket"""
+    import socketserver
+    import threading
+    
+    server = Server(dispatcher)
+    
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+            
+            def write(message: Dict[str, Any]):
+                try:
+                    with write_lock:
+                        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                except (OSError, ValueError) as e:
+                    # ValueError: the client closed and its handler finished while another thread was replying
+                    print(f"Client went away before reply: {e}", file=sys.stderr)
+            
+            for line in self.rfile:
+                line = line.strip()
+                if line:
+                    server.handle_line(line.decode("utf-8"), write)
+    
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    
+    unix_server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    unix_server.daemon_threads = True
+    wait_for_dispatcher(dispatcher, ready_timeout)
+    print(f"Chat server listening on {socket_path}", file=sys.stderr)
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
 
 def main():
     start_time = time.time()
@@ -350,24 +1100,35 @@ def main():
         print(f"Input received: {data}", file=sys.stderr)
         
         processor = ChatProcessor()
+        
+        if data.get('stream'):
+            # One JSON event per line so consumers can render tokens as they arrive
+            stream_chat(processor, data, lambda event: print(json.dumps(event), flush=True))
+            processor.conversation_log.close()
+            startup.print_report("Chat processor")
+            print(f"Total processing time: {time.time() - start_time:.2f}s", file=sys.stderr)
+            return
+        
         result = processor.process_query(
             data['message'], 
             data.get('language', 'en'), 
             data.get('history', [])
         )
         
-        # Save conversation
-        processor.save_conversation(data['message'], result['text'])
-        
-        # Output result as JSON
-        print(json.dumps(result))
+        # Output result as JSON, then save the conversation
+        print(json.dumps(result), flush=True)
+        if result.get('text'):
+            processor.save_conversation(data['message'], result['text'], data.get('language', 'en'),
+                                        result.get('route'), result.get('timings'))
+        processor.conversation_log.close()
+        startup.print_report("Chat processor")
         print(f"Total processing time: {time.time() - start_time:.2f}s", file=sys.stderr)
-        
+    
     except Exception as e:
         print(f"Main error: {e}", file=sys.stderr)
         error_result = {
             "success": False,
-            "text": "I'm experiencing technical difficulties. Please try again or ask about universities, programs, or visa requirements.",
+            "text": ERROR_TEXT,
             "followUps": [
                 "What programs are available?",
                 "Tell me about admission requirements",
@@ -376,5 +1137,42 @@ def main():
         }
         print(json.dumps(error_result))
 
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="VisaMonk chat processor")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the processor warm and serve line-delimited JSON requests")
+    parser.add_argument("--socket", default=None,
+                        help="serve on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('CHAT_WORKERS', 1)),
+                        help="number of warm worker processes (1 serves in-process)")
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv('CHAT_QUEUE_SIZE', 32)),
+                        help="requests allowed to wait for a worker before replying busy")
+    parser.add_argument("--deadline", type=float, default=float(os.getenv('CHAT_DEADLINE', 30)),
+                        help="seconds a request may take before it is answered with a timeout")
+    parser.add_argument("--ready-timeout", type=float, default=float(os.getenv('CHAT_READY_TIMEOUT', 300)),
+                        help="seconds to wait for the workers to load before exiting with an error")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.serve:
+        # Exit through the finally below on SIGTERM so queued conversation rows are written
+        import signal
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        if args.workers > 1:
+            from worker_pool import WorkerPool
+            dispatcher = WorkerPool(args.workers, args.queue_size, args.deadline)
+        else:
+            dispatcher = InlineDispatcher(ChatProcessor(preload=True))
+            startup.print_report("Chat server")
+        try:
+            if args.socket:
+                serve_socket(dispatcher, args.socket, args.ready_timeout)
+            else:
+                serve_stdio(dispatcher, args.ready_timeout)
+        finally:
+            if hasattr(dispatcher, 'shutdown'):
+                dispatcher.shutdown()
+    else:
+        main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import os
+import json
+import mmap
+from typing import Dict, Any, Optional, Iterator
+import numpy as np
+
+BLOB_FILE = "chunks.bin"
+INDEX_FILE = "chunks.idx"
+SOURCES_FILE = "chunks_sources.json"
+
+# One fixed-size record per chunk, sorted by FAISS id, pointing into the UTF-8 blob
+RECORD_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("offset", "<i8"),
+    ("length", "<i4"),
+    ("source", "<i4"),
+    ("position", "<i4"),
+    ("char_start", "<i8")
+])
+
+def store_exists(directory: str = "vectorstore") -> bool:
+    return all(os.path.exists(os.path.join(directory, name)) for name in (BLOB_FILE, INDEX_FILE, SOURCES_FILE))
+
+class ChunkStore:
+    """Read-only, memory-mapped chunk texts looked up by FAISS id.
+    Only the pages holding requested chunks are touched, and processes mapping
+    the same files share them through the page cache."""
+    
+    def __init__(self, directory: str = "vectorstore"):
+        self.directory = directory
+        self.records = np.load(os.path.join(directory, INDEX_FILE), mmap_mode="r")
+        with open(os.path.join(directory, SOURCES_FILE), "r", encoding="utf-8") as f:
+            self.sources = json.load(f)
+        with open(os.path.join(directory, BLOB_FILE), "rb") as f:
+            # mmap can't map an empty file
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def find(self, chunk_id: int) -> Optional[int]:
+        """Row of a chunk id, or None"""
+        row = int(np.searchsorted(self.records["id"], chunk_id))
+        if row < len(self.records) and self.records["id"][row] == chunk_id:
+            return row
+        return None
+    
+    def get(self, chunk_id: int) -> Optional[str]:
+        """Text of a chunk"""
+        row = self.find(chunk_id)
+        if row is None:
+            return None
+        record = self.records[row]
+        offset = int(record["offset"])
+        return self.blob[offset:offset + int(record["length"])].decode("utf-8")
+    
+    def metadata(self, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """Source file and position of a chunk"""
+        row = self.find(chunk_id)
+        if row is None:
+            return None
+        record = self.records[row]
+        return {
+            "source": self.sources[int(record["source"])],
+            "position": int(record["position"]),
+            "char_start": int(record["char_start"])
+        }
+    
+    def ids(self) -> np.ndarray:
+        return np.asarray(self.records["id"])
+    
+    def iter_chunks(self, ids) -> Iterator[Dict[str, Any]]:
+        """Text and metadata for each of the given ids that exists"""
+        for chunk_id in ids:
+            text = self.get(int(chunk_id))
+            if text is not None:
+                yield {"id": int(chunk_id), "text": text, **self.metadata(int(chunk_id))}
+    
+    def close(self):
+        if isinstance(self.blob, mmap.mmap):
+            self.blob.close()
+
+class ChunkStoreWriter:
+    """Streams chunk texts into a new store, replacing the old one atomically on close"""
+    
+    def __init__(self, directory: str = "vectorstore"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.blob_path = os.path.join(directory, BLOB_FILE + ".tmp")
+        self.blob = open(self.blob_path, "wb")
+        self.offset = 0
+        self.records = []
+        self.sources = []
+        self.source_rows = {}
+    
+    def add(self, chunk_id: int, text: str, source: str, position: int, char_start: int = -1):
+        data = text.encode("utf-8")
+        self.blob.write(data)
+        if source not in self.source_rows:
+            self.source_rows[source] = len(self.sources)
+            self.sources.append(source)
+        self.records.append((chunk_id, self.offset, len(data), self.source_rows[source], position, char_start))
+        self.offset += len(data)
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def close(self):
+        """Write the sorted record index and move every file into place"""
+        self.blob.close()
+        records = np.array(self.records, dtype=RECORD_DTYPE)
+        records.sort(order="id")
+        
+        index_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(index_path, "wb") as f:
+            np.save(f, records)
+        sources_path = os.path.join(self.directory, SOURCES_FILE + ".tmp")
+        with open(sources_path, "w", encoding="utf-8") as f:
+            json.dump(self.sources, f)
+        
+        # Index last, so a reader never sees records pointing past the blob
+        os.replace(self.blob_path, os.path.join(self.directory, BLOB_FILE))
+        os.replace(sources_path, os.path.join(self.directory, SOURCES_FILE))
+        os.replace(index_path, os.path.join(self.directory, INDEX_FILE))
+    
+    def abort(self):
+        self.blob.close()
+        if os.path.exists(self.blob_path):
+            os.remove(self.blob_path)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import os
+import sys
+import math
+from typing import List, Dict, Any
+
+# Most tokens of retrieved text sent to Gemini per request
+RAG_CONTEXT_TOKENS = int(os.getenv('RAG_CONTEXT_TOKENS', 1000))
+# Rough characters per token for English text; close enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+# Shorter shared text between chunks without offsets is treated as coincidence, not overlap
+MIN_OVERLAP_CHARS = 32
+# A passage cut shorter than this is left out rather than sent as a fragment
+MIN_PASSAGE_TOKENS = 48
+SEPARATOR = "\n\n"
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def relevance(chunk: Dict[str, Any]) -> float:
+    """Cross-encoder score when the chunk was reranked, otherwise its fused retrieval score"""
+    if chunk.get("rerank_score") is not None:
+        return chunk["rerank_score"]
+    return chunk.get("score") or 0.0
+
+def text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right"""
+    for length in range(min(len(left), len(right)) - 1, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+def merge_chunk(passages: List[Dict[str, Any]], chunk: Dict[str, Any]):
+    """Fold a chunk into the passage it overlaps, keeping only the text that passage lacks, or start a new passage"""
+    text = chunk["text"]
+    source = chunk.get("source")
+    start = chunk.get("char_start", -1)
+    end = start + len(text)
+    for passage in passages:
+        if text in passage["text"]:
+            return
+        if source is not None and start >= 0 and passage["source"] is not None and passage["start"] >= 0:
+            # Chunks with known offsets overlap exactly where their spans in the same file do
+            if passage["source"] == source and start < passage["end"] and end > passage["start"]:
+                if start < passage["start"]:
+                    passage["text"] = text[:passage["start"] - start] + passage["text"]
+                    passage["start"] = start
+                if end > passage["end"]:
+                    passage["text"] += text[passage["end"] - start:]
+                    passage["end"] = end
+                return
+            continue
+        overlap = text_overlap(passage["text"], text)
+        if overlap:
+            passage["text"] += text[overlap:]
+            return
+        overlap = text_overlap(text, passage["text"])
+        if overlap:
+            passage["text"] = text[:-overlap] + passage["text"]
+            return
+    passages.append({"source": source, "start": start, "end": end, "text": text})
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cut text to max_chars, at the last sentence end or else the last space that fits"""
+    if len(text) <= max_chars:
+        return text
+    cut = max(text.rfind(". ", 0, max_chars), text.rfind("\n", 0, max_chars))
+    if cut < max_chars // 2:
+        cut = text.rfind(" ", 0, max_chars)
+    return text[:cut + 1 if cut > 0 else max_chars].strip()
+
+def build_context(chunks: List[Dict[str, Any]], max_tokens: int = RAG_CONTEXT_TOKENS) -> str:
+    """Prompt context from retrieved chunks: text repeated by overlapping chunks appears once,
+    the most relevant passages come first, and passages that would exceed max_tokens are cut or left out"""
+    passages = []
+    for chunk in sorted(chunks, key=relevance, reverse=True):
+        merge_chunk(passages, chunk)
+    
+    selected = []
+    remaining = max_tokens
+    for passage in passages:
+        cost = estimate_tokens(passage["text"]) + (estimate_tokens(SEPARATOR) if selected else 0)
+        if cost <= remaining:
+            selected.append(passage["text"])
+            remaining -= cost
+        elif remaining >= MIN_PASSAGE_TOKENS:
+            selected.append(truncate(passage["text"], remaining * CHARS_PER_TOKEN - len(SEPARATOR)))
+            remaining = 0
+    context = SEPARATOR.join(selected)
+    
+    retrieved = sum(estimate_tokens(chunk["text"]) for chunk in chunks)
+    print(f"Context: {len(chunks)} chunks in {len(passages)} passages, ~{estimate_tokens(context)} of "
+          f"~{retrieved} retrieved tokens kept", file=sys.stderr)
+    return context
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import queue
+import atexit
+import sqlite3
+import time
+import datetime
+import threading
+from typing import Dict, Any, List
+import db
+
+# Columns added to conversation_history after the original (query, response, timestamp)
+EXTRA_COLUMNS = {"language": "TEXT", "route": "TEXT", "latency": "REAL", "timings": "TEXT"}
+# Tries per batch when the database is locked or busy, waiting RETRY_DELAY seconds, then twice that, and so on
+WRITE_ATTEMPTS = int(os.getenv('CONVERSATION_LOG_ATTEMPTS', 4))
+RETRY_DELAY = 0.5
+
+class ConversationLogger:
+    """Write-behind logger for conversation_history: rows are queued without blocking the response
+    and inserted by a background thread in one transaction per batch"""
+    
+    def __init__(self, db_path: str = db.DB_PATH, batch_size: int = None, interval: float = None):
+        self.db_path = db_path
+        self.batch_size = batch_size or int(os.getenv('CONVERSATION_LOG_BATCH', 50))
+        self.interval = interval or float(os.getenv('CONVERSATION_LOG_INTERVAL', 2.0))
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.counters = {"logged": 0, "flushed": 0, "batches": 0, "errors": 0, "retries": 0, "dropped": 0}
+        self.setup_table()
+        atexit.register(self.close)
+    
+    def setup_table(self):
+        """Create the table if needed and add the route and latency columns to older databases"""
+        try:
+            with db.transaction(self.db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS conversation_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        query TEXT,
+                        response TEXT,
+                        timestamp TEXT
+                    )
+                """)
+                existing = {row[1] for row in conn.execute("PRAGMA table_info(conversation_history)")}
+                for column, column_type in EXTRA_COLUMNS.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE conversation_history ADD COLUMN {column} {column_type}")
+        except sqlite3.Error as e:
+            print(f"Error preparing conversation_history: {e}", file=sys.stderr)
+    
+    def log(self, query: str, response: str, language: str = None, route: str = None, timings: Dict[str, Any] = None):
+        """Queue one conversation row; returns immediately"""
+        import pytz
+        timestamp = datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M:%S')
+        timings = timings or {}
+        self.queue.put((
+            query, response, timestamp, language, route,
+            timings.get("total"), json.dumps(timings) if timings else None
+        ))
+        self.counters["logged"] += 1
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="conversation-logger", daemon=True)
+                self.thread.start()
+    
+    def run(self):
+        """Collect rows until the batch is full or the interval passes, then write them"""
+        while True:
+            rows = []
+            stop = False
+            try:
+                item = self.queue.get()
+                if item is None:
+                    break
+                rows.append(item)
+                deadline = time.time() + self.interval
+                while len(rows) < self.batch_size:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.time()))
+                    if item is None:
+                        stop = True
+                        break
+                    rows.append(item)
+            except queue.Empty:
+                pass
+            self.write(rows)
+            if stop:
+                break
+    
+    def write(self, rows: List[tuple]):
+        """Insert a batch, retrying with backoff while another writer (e.g. a long upload) holds the database"""
+        if not rows:
+            return
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                with db.transaction(self.db_path) as conn:
+                    conn.executemany(
+                        "INSERT INTO conversation_history (query, response, timestamp, language, route, latency, timings) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                self.counters["flushed"] += len(rows)
+                self.counters["batches"] += 1
+                print(f"Saved {len(rows)} conversations to database", file=sys.stderr)
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == WRITE_ATTEMPTS:
+                    error = e
+                    break
+                delay = RETRY_DELAY * 2 ** (attempt - 1)
+                self.counters["retries"] += 1
+                print(f"Error saving conversations ({e}), retrying in {delay:.1f}s", file=sys.stderr)
+                time.sleep(delay)
+            except Exception as e:
+                error = e
+                break
+        self.counters["errors"] += 1
+        self.counters["dropped"] += len(rows)
+        print(f"Error saving conversations, dropped {len(rows)}: {error}", file=sys.stderr)
+    
+    def close(self):
+        """Write everything still queued and stop the background thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout=30)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": self.queue.qsize()}
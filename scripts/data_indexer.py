@@ -2,19 +2,51 @@
 import sys
 import json
 import os
-import shutil
-from sentence_transformers import SentenceTransformer
+import hashlib
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import faiss
 import numpy as np
-import pickle
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import data_version
+from chunk_store import ChunkStore, ChunkStoreWriter, store_exists
+from embedding_cache import EmbeddingCache
+from lexical_index import LEXICAL_PATH, LexicalIndexWriter, fts5_available
+
+INDEX_PATH = "vectorstore/index.faiss"
+VECTORSTORE_DIR = "vectorstore"
+# Written by older versions; replaced by the memory-mapped chunk store
+LEGACY_CHUNKS_PATH = "vectorstore/chunks.pkl"
+MANIFEST_PATH = "vectorstore/manifest.json"
+INDEX_META_PATH = "vectorstore/index_meta.json"
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# "auto" uses exact search for small corpora and switches to IVF past this many chunks
+INDEX_TYPES = ("auto", "flat", "ivf_flat", "hnsw", "ivf_pq")
+ANN_THRESHOLD = int(os.getenv('FAISS_ANN_THRESHOLD', 50000))
+# IVF indexes are retrained once the corpus outgrows the set they were trained on by this factor
+RETRAIN_GROWTH = 4
+# Vectors sampled per IVF list to train a rebuilt index
+TRAIN_POINTS_PER_LIST = 256
+# Vectors reconstructed per step when copying into a rebuilt index
+COPY_BATCH_SIZE = 65536
+
+# Chunks per encoder call, and threads that hash, read and split files
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 256))
+INDEX_WORKERS = int(os.getenv('INDEX_WORKERS', os.cpu_count() or 4))
 
 def main():
     try:
-        # Load and index all text data
-        result = load_and_index_data()
+        # Re-embed only new or changed files unless a full rebuild is requested
+        args = parse_args()
+        result = load_and_index_data(full=args.full, index_type=args.index_type,
+                                     batch_size=args.batch_size, workers=args.workers)
         print(json.dumps(result))
-        
+    
     except Exception as e:
         error_result = {
             "success": False,
@@ -25,33 +57,222 @@ def main():
         print(json.dumps(error_result))
         sys.exit(1)
 
-def load_and_index_data():
-    """Load and index data for FAISS"""
-    all_texts = []
-    files_processed = 0
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the FAISS vectorstore")
+    parser.add_argument("--full", action="store_true", help="re-embed every file instead of only changed ones")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.getenv('FAISS_INDEX_TYPE', 'auto'),
+                        help="FAISS index structure (default: auto)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help=f"chunks per embedding batch (default: {EMBED_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=INDEX_WORKERS,
+                        help=f"threads reading and splitting files (default: {INDEX_WORKERS})")
+    return parser.parse_args()
+
+def list_source_files() -> list:
+    """Text files that feed the vectorstore"""
+    paths = []
     
     # Load university_info.txt
     uni_info_file = "data/university_info.txt"
     if os.path.exists(uni_info_file):
-        with open(uni_info_file, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if content:
-                all_texts.append(content)
-                files_processed += 1
+        paths.append(uni_info_file)
     
     # Load scraped_data
     scraped_dir = "scraped_data"
     if os.path.exists(scraped_dir):
-        for file_name in os.listdir(scraped_dir):
+        for file_name in sorted(os.listdir(scraped_dir)):
             if file_name.endswith(".txt"):
-                file_path = os.path.join(scraped_dir, file_name)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    if content:
-                        all_texts.append(content)
-                        files_processed += 1
-    
-    if not all_texts:
+                paths.append(os.path.join(scraped_dir, file_name))
+    
+    return paths
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def empty_manifest() -> dict:
+    return {
+        "model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "next_id": 0,
+        "files": {}
+    }
+
+def load_existing_store():
+    """Manifest, ID-mapped index and chunk store from the last run, or None if they can't be reused"""
+    if not all(os.path.exists(path) for path in (INDEX_PATH, MANIFEST_PATH)) or not store_exists(VECTORSTORE_DIR):
+        return None
+    
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    # Chunks made with other settings can't be mixed with new ones
+    settings = (manifest.get("model"), manifest.get("chunk_size"), manifest.get("chunk_overlap"))
+    if settings != (EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP):
+        return None
+    
+    index = faiss.read_index(INDEX_PATH)
+    # Indexes written before incremental indexing have no IDs
+    if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)):
+        return None
+    
+    return manifest, index, ChunkStore(VECTORSTORE_DIR)
+
+def load_index_meta() -> dict:
+    if not os.path.exists(INDEX_META_PATH):
+        return {"type": "flat"}
+    with open(INDEX_META_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def choose_index_type(requested: str, total: int) -> str:
+    """Concrete index type for the corpus size"""
+    if requested != "auto":
+        return requested
+    return "ivf_flat" if total >= ANN_THRESHOLD else "flat"
+
+def index_params(index_type: str, total: int, dimension: int) -> dict:
+    """Build and default search parameters for an index over `total` vectors"""
+    params = {"type": index_type, "dimension": dimension, "trained_on": total}
+    
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # ~4*sqrt(n) lists, with enough points per list to train the coarse quantizer
+        nlist = max(1, min(int(4 * math.sqrt(total)), total // 39))
+        params["nlist"] = int(os.getenv('FAISS_NLIST', nlist))
+        params["nprobe"] = min(params["nlist"], int(os.getenv('FAISS_NPROBE', 16)))
+    
+    if index_type == "ivf_pq":
+        # Sub-quantizers must divide the dimension; 8-bit codes need 256 training points
+        m = int(os.getenv('FAISS_PQ_M', 48))
+        while dimension % m:
+            m -= 1
+        params["m"] = m
+        params["nbits"] = max(1, min(8, int(math.log2(max(total, 2)))))
+    
+    if index_type == "hnsw":
+        params["hnsw_m"] = int(os.getenv('FAISS_HNSW_M', 32))
+        params["ef_construction"] = int(os.getenv('FAISS_EF_CONSTRUCTION', 200))
+        params["ef_search"] = int(os.getenv('FAISS_EF_SEARCH', 64))
+    
+    return params
+
+def build_index(params: dict, sources: list):
+    """Create, train and fill an ID-addressable index from (index, ids) pairs holding the vectors"""
+    dimension = params["dimension"]
+    index_type = params["type"]
+    sources = [(source, ids) for source, ids in sources if len(ids)]
+    
+    if index_type == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+    elif index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        hnsw.hnsw.efConstruction = params["ef_construction"]
+        hnsw.hnsw.efSearch = params["ef_search"]
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["m"], params["nbits"])
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"])
+        index.train(sample_vectors(sources, params["nlist"] * TRAIN_POINTS_PER_LIST))
+        index.nprobe = params["nprobe"]
+        # IVF takes IDs natively; a hashtable direct map allows reconstructing vectors by ID
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    
+    # Copy in slices so the full corpus is never reconstructed at once
+    for source, ids in sources:
+        for start in range(0, len(ids), COPY_BATCH_SIZE):
+            batch = np.ascontiguousarray(ids[start:start + COPY_BATCH_SIZE])
+            index.add_with_ids(source.reconstruct_batch(batch), batch)
+    return index
+
+def sample_vectors(sources: list, limit: int) -> np.ndarray:
+    """Evenly spaced sample of at most about `limit` vectors across the sources"""
+    total = sum(len(ids) for _, ids in sources)
+    step = max(1, total // max(limit, 1))
+    return np.concatenate([
+        source.reconstruct_batch(np.ascontiguousarray(ids[::step])) for source, ids in sources
+    ]).astype("float32")
+
+def needs_rebuild(index, meta: dict, target_type: str, total: int, has_stale: bool) -> bool:
+    """Whether the index must be rebuilt rather than updated in place"""
+    if index is None or meta.get("type") != target_type:
+        return True
+    # HNSW graphs can't drop vectors
+    if target_type == "hnsw" and has_stale:
+        return True
+    if target_type in ("ivf_flat", "ivf_pq") and total > RETRAIN_GROWTH * max(meta.get("trained_on", 0), 1):
+        return True
+    return False
+
+def write_atomic(path: str, write):
+    """Write to a temporary file and move it into place so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def split_file(text_splitter, path: str):
+    """Read and split one file into (text, char_start) chunks"""
+    start = time.time()
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    
+    chunks = []
+    cursor = 0
+    for chunk in (text_splitter.split_text(content) if content else []):
+        # Character offset of the chunk in its file, for citations
+        char_start = content.find(chunk, cursor)
+        cursor = char_start + 1 if char_start >= 0 else cursor
+        chunks.append((chunk, char_start))
+    return path, chunks, time.time() - start
+
+def split_files(executor, text_splitter, paths: list, window: int):
+    """Split files on the pool and yield them in order, with at most `window` files in flight"""
+    pending = deque()
+    for path in paths:
+        pending.append(executor.submit(split_file, text_splitter, path))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def embed_batch(embedding_model, embedding_cache, sink, texts: list, ids: list, batch_size: int, timings: dict):
+    """Encode one batch (reusing cached vectors) and add it to the index being filled
+    (a flat staging index is created on first use)"""
+    start = time.time()
+    vectors = embedding_cache.encode(embedding_model, texts, batch_size=batch_size)
+    timings["embed"] += time.time() - start
+    
+    start = time.time()
+    if sink is None:
+        sink = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+    sink.add_with_ids(vectors, np.array(ids, dtype="int64"))
+    timings["index"] += time.time() - start
+    return sink
+
+def load_and_index_data(full: bool = False, index_type: str = "auto", batch_size: int = EMBED_BATCH_SIZE, workers: int = INDEX_WORKERS):
+    """Load and index data for FAISS, embedding only files that changed since the last run"""
+    run_start = time.time()
+    timings = {"hash": 0.0, "load_model": 0.0, "split": 0.0, "embed": 0.0, "index": 0.0, "write": 0.0}
+    existing = None if full else load_existing_store()
+    if existing:
+        manifest, index, old_store = existing
+        meta = load_index_meta()
+    else:
+        manifest, index, old_store, meta = empty_manifest(), None, None, {}
+    
+    paths = list_source_files()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        current = dict(zip(paths, executor.map(file_hash, paths)))
+    timings["hash"] = time.time() - run_start
+    previous = manifest["files"]
+    
+    if not current and not previous:
         return {
             "success": True,
             "message": "No text data found for indexing",
@@ -59,13 +280,86 @@ def load_and_index_data():
             "files": 0
         }
     
-    # Split texts into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = []
-    for text in all_texts:
-        chunks.extend(text_splitter.split_text(text))
+    removed = [path for path in previous if path not in current]
+    changed = [path for path in current if path in previous and previous[path]["hash"] != current[path]]
+    added = [path for path in current if path not in previous]
+    unchanged = len(current) - len(changed) - len(added)
     
-    if not chunks:
+    # Drop vectors of files that were deleted or rewritten (HNSW is rebuilt instead)
+    stale_ids = [chunk_id for path in removed + changed for chunk_id in previous[path]["ids"]]
+    if stale_ids and index is not None and meta.get("type") != "hnsw":
+        index.remove_ids(np.array(stale_ids, dtype="int64"))
+    for path in removed:
+        del previous[path]
+    
+    # Chunks of unchanged files are copied into the new store straight from the old mapping
+    kept_ids = np.setdiff1d(old_store.ids(), np.array(stale_ids, dtype="int64")) if old_store is not None else np.zeros(0, dtype="int64")
+    lexical_missing = fts5_available() and not os.path.exists(LEXICAL_PATH)
+    store_changed = bool(removed or changed or added or not existing or lexical_missing)
+    writer = ChunkStoreWriter(VECTORSTORE_DIR) if store_changed else None
+    # The BM25 index is updated in place, or rebuilt from scratch with the rest of the store
+    backfill_lexical = not existing or lexical_missing
+    lexical = LexicalIndexWriter(LEXICAL_PATH, rebuild=backfill_lexical) if store_changed else None
+    if lexical is not None and not backfill_lexical:
+        lexical.remove(stale_ids)
+    if old_store is not None and writer is not None:
+        for chunk in old_store.iter_chunks(kept_ids):
+            writer.add(chunk["id"], chunk["text"], chunk["source"], chunk["position"], chunk["char_start"])
+            if backfill_lexical:
+                lexical.add(chunk["id"], chunk["text"])
+    
+    # New vectors go straight into the existing index when it can be updated in place,
+    # otherwise into a flat staging index that the rebuild below reads from
+    in_place = index is not None and not (meta.get("type") == "hnsw" and stale_ids)
+    sink = index if in_place else None
+    
+    # Split new or changed files on the pool and embed them in bounded batches as they arrive
+    text_splitter = embedding_model = None
+    if changed or added:
+        # The splitter and model are only imported when there is something to embed
+        load_start = time.time()
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from sentence_transformers import SentenceTransformer
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        timings["load_model"] = time.time() - load_start
+    # Chunks seen before (files edited elsewhere, full rebuilds) skip the encoder
+    embedding_cache = EmbeddingCache(EMBEDDING_MODEL)
+    first_new_id = manifest["next_id"]
+    batch_texts, batch_ids = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, chunks, seconds in split_files(executor, text_splitter, changed + added, 2 * workers):
+            timings["split"] += seconds
+            ids = list(range(manifest["next_id"], manifest["next_id"] + len(chunks)))
+            manifest["next_id"] += len(chunks)
+            for position, (chunk_id, (chunk, char_start)) in enumerate(zip(ids, chunks)):
+                writer.add(chunk_id, chunk, path, position, char_start)
+                lexical.add(chunk_id, chunk)
+                batch_texts.append(chunk)
+                batch_ids.append(chunk_id)
+                if len(batch_texts) >= batch_size:
+                    sink = embed_batch(embedding_model, embedding_cache, sink, batch_texts, batch_ids, batch_size, timings)
+                    batch_texts, batch_ids = [], []
+            previous[path] = {"hash": current[path], "ids": ids}
+    if batch_texts:
+        sink = embed_batch(embedding_model, embedding_cache, sink, batch_texts, batch_ids, batch_size, timings)
+    
+    new_ids = np.arange(first_new_id, manifest["next_id"], dtype="int64")
+    chunks_embedded = len(new_ids)
+    files_processed = sum(1 for entry in previous.values() if entry["ids"])
+    total = len(kept_ids) + len(new_ids)
+    if old_store is not None:
+        old_store.close()
+    
+    if not total:
+        if writer is not None:
+            writer.abort()
+        if lexical is not None:
+            lexical.abort()
+        for path in (INDEX_PATH, MANIFEST_PATH, INDEX_META_PATH, LEXICAL_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+        data_version.bump("vectorstore")
         return {
             "success": True,
             "message": "No chunks created",
@@ -73,37 +367,70 @@ def load_and_index_data():
             "files": files_processed
         }
     
-    # Create embeddings
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = embedding_model.encode(chunks)
-    
-    # Create FAISS index
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings.astype('float32'))
-    
-    # Save index and chunks
-    os.makedirs("vectorstore", exist_ok=True)
+    # Pick the index structure for the new corpus size and rebuild when it changes
+    target_type = choose_index_type(index_type, total)
+    dimension = sink.d if sink is not None else meta.get("dimension", index.d if index is not None else 0)
     
-    # Remove old index if exists
-    if os.path.exists("vectorstore/index.faiss"):
-        os.remove("vectorstore/index.faiss")
-    if os.path.exists("vectorstore/chunks.pkl"):
-        os.remove("vectorstore/chunks.pkl")
+    rebuilt = needs_rebuild(index, meta, target_type, total, bool(stale_ids))
+    if rebuilt:
+        rebuild_start = time.time()
+        if in_place:
+            sources = [(index, np.concatenate([kept_ids, new_ids]))]
+        else:
+            sources = [(index, kept_ids), (sink, new_ids)]
+        meta = index_params(target_type, total, dimension)
+        index = build_index(meta, sources)
+        timings["index"] += time.time() - rebuild_start
+        print(f"Built {target_type} index over {total} chunks", file=sys.stderr)
+    meta["ntotal"] = int(index.ntotal)
     
-    # Save new index
-    faiss.write_index(index, "vectorstore/index.faiss")
-    
-    # Save chunks
-    with open("vectorstore/chunks.pkl", 'wb') as f:
-        pickle.dump(chunks, f)
+    if store_changed or rebuilt:
+        write_start = time.time()
+        os.makedirs("vectorstore", exist_ok=True)
+        
+        write_atomic(INDEX_PATH, lambda tmp_path: faiss.write_index(index, tmp_path))
+        
+        if writer is not None:
+            writer.close()
+        if lexical is not None:
+            lexical.commit()
+        if os.path.exists(LEGACY_CHUNKS_PATH):
+            os.remove(LEGACY_CHUNKS_PATH)
+        
+        def write_manifest(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+        write_atomic(MANIFEST_PATH, write_manifest)
+        
+        # Index parameters travel with the index so chat_processor configures searches to match
+        def write_meta(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        write_atomic(INDEX_META_PATH, write_meta)
+        
+        # Tell running chat workers to reload the index and drop cached answers
+        data_version.bump("vectorstore")
+        timings["write"] = time.time() - write_start
     
+    elapsed = time.time() - run_start
+    timings["total"] = elapsed
     return {
         "success": True,
-        "message": f"Successfully indexed {len(chunks)} chunks from {files_processed} files",
-        "chunks": len(chunks),
-        "files": files_processed
+        "message": f"Indexed {total} chunks from {files_processed} files "
+                   f"({len(added)} added, {len(changed)} changed, {len(removed)} removed, {unchanged} unchanged)",
+        "chunks": total,
+        "files": files_processed,
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed),
+        "unchanged": unchanged,
+        "chunks_embedded": chunks_embedded,
+        "embedding_cache_hits": embedding_cache.counters["hits"],
+        "chunks_per_sec": round(chunks_embedded / elapsed, 1) if elapsed else 0.0,
+        "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        "index_type": meta["type"],
+        "rebuilt": rebuilt
     }
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+import os
+import time
+from typing import Tuple
+
+# Stamp files rewritten whenever the data behind an answer changes, so
+# long-lived chat workers can tell that their caches are stale.
+STAMPS = {
+    "vectorstore": "vectorstore/.version",
+    "universities": "data/.universities.version"
+}
+
+def bump(name: str):
+    """Record that the named data source has changed"""
+    path = STAMPS[name]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+def read(name: str) -> str:
+    """Current stamp of the named data source ('' if it was never bumped)"""
+    try:
+        with open(STAMPS[name], "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def snapshot(*names: str) -> Tuple[str, ...]:
+    """Stamps of the given data sources (all of them by default)"""
+    return tuple(read(name) for name in (names or STAMPS))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = "data/chatbot.db"
+# How long a writer waits for another writer's lock before failing
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+# Prepared statements kept per connection
+STATEMENT_CACHE = 256
+
+# Columns the generated SELECTs filter on
+INDEXED_COLUMNS = ["university", "program", "location"]
+
+_local = threading.local()
+
+def open_connection(path: str, read_only: bool) -> sqlite3.Connection:
+    """New connection in WAL mode with a busy timeout; read-only ones refuse any write"""
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE)
+        # Readers see the last committed snapshot instead of waiting for bulk inserts
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+def connect(path: str = DB_PATH, read_only: bool = False) -> sqlite3.Connection:
+    """Pooled connection for this process and thread, reused so its prepared statements stay cached.
+    Callers commit their own writes and must not close it."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    # Keyed by pid too, so a forked child never reuses its parent's connection
+    key = (os.path.abspath(path), read_only, os.getpid())
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = open_connection(path, read_only)
+    return conn
+
+@contextmanager
+def transaction(path: str = DB_PATH):
+    """Pooled writable connection that commits on success and rolls back on error"""
+    conn = connect(path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """Index the universities columns the SQL path filters on, once the table exists"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'universities'").fetchone():
+        return
+    for column in INDEXED_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_universities_{column} ON universities ({column})")
+    conn.commit()
+
+def close_all():
+    """Close this thread's pooled connections"""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import os
+import sys
+import fcntl
+import sqlite3
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.db"
+LOCK_FILE = "lock"
+
+# Keys looked up per SQL statement, under SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+# Seconds between writes of the last-used times of cache hits; lookups themselves never write
+FLUSH_INTERVAL = float(os.getenv('EMBEDDING_CACHE_FLUSH', 30))
+
+class EmbeddingCache:
+    """Persistent embeddings keyed by model name and text hash, shared by the chat workers and the indexer.
+    Vectors live in a float32 array file addressed by slot; a SQLite index maps keys to slots
+    and evicts the least recently used entry once the file is full."""
+    
+    def __init__(self, model_name: str, directory: str = None, max_entries: int = None):
+        self.model_name = model_name
+        self.directory = directory or os.getenv('EMBEDDING_CACHE_DIR', 'cache/embeddings')
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('EMBEDDING_CACHE_SIZE', 200000))
+        self.dimension = None
+        self.vectors = None
+        self.conn = None
+        # Threads share the connection; the file lock keeps other processes off half-written slots
+        self.lock = threading.Lock()
+        # Last-used times of hits not yet written to the index, by key
+        self.recent = {}
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+        if self.max_entries > 0:
+            try:
+                self.open()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Embedding cache disabled: {e}", file=sys.stderr)
+                self.conn = None
+        if self.enabled:
+            threading.Thread(target=self.flush_loop, daemon=True).start()
+    
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock_file = open(os.path.join(self.directory, LOCK_FILE), "a+")
+        self.conn = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), timeout=30,
+                                    isolation_level=None, check_same_thread=False)
+        with self.locked(fcntl.LOCK_EX):
+            self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            capacity = self.conn.execute("SELECT value FROM meta WHERE name = 'capacity'").fetchone()
+            if not capacity or capacity[0] != self.max_entries:
+                # Slots are laid out for one capacity; start over when it changes
+                self.reset()
+            else:
+                self.map_stored_vectors()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.conn is not None
+    
+    @contextmanager
+    def locked(self, mode: int):
+        with self.lock:
+            fcntl.flock(self.lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+    
+    def reset(self):
+        """Empty the cache (caller holds the exclusive lock)"""
+        self.conn.execute("DELETE FROM entries")
+        self.conn.execute("DELETE FROM meta")
+        self.conn.execute("INSERT INTO meta (name, value) VALUES ('capacity', ?), ('size', 0)", (self.max_entries,))
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            os.remove(vectors_path)
+        self.dimension = None
+        self.vectors = None
+    
+    def map_vectors(self, dimension: int):
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        mode = "r+" if os.path.exists(vectors_path) else "w+"
+        self.vectors = np.memmap(vectors_path, dtype="float32", mode=mode, shape=(self.max_entries, dimension))
+        self.dimension = dimension
+    
+    def map_stored_vectors(self) -> bool:
+        """Map the vector file once another process has fixed its dimension"""
+        meta = dict(self.conn.execute("SELECT name, value FROM meta").fetchall())
+        if not meta.get("dimension"):
+            return False
+        self.map_vectors(meta["dimension"])
+        return True
+    
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """Cached vectors by position in `texts`"""
+        keys = [self.key(text) for text in texts]
+        slots = {}
+        with self.locked(fcntl.LOCK_SH):
+            if self.dimension is None and not self.map_stored_vectors():
+                return {}
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = list(set(keys[start:start + LOOKUP_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                slots.update(self.conn.execute(f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch).fetchall())
+            found = {position: np.array(self.vectors[slots[key]]) for position, key in enumerate(keys) if key in slots}
+            now = time.time()
+            self.recent.update((key, now) for key in slots)
+        return found
+    
+    def write_recent(self):
+        """Write pending last-used times (caller holds the exclusive lock inside a transaction)"""
+        if self.recent:
+            self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                  ((used, key) for key, used in self.recent.items()))
+            self.recent = {}
+    
+    def flush(self):
+        """Write pending last-used times in one transaction, so eviction in any process sees them"""
+        with self.locked(fcntl.LOCK_EX):
+            if not self.recent:
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.write_recent()
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    def flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Embedding cache flush error: {e}", file=sys.stderr)
+                self.counters["errors"] += 1
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Store vectors, evicting the least recently used entries when the cache is full"""
+        entries = dict(zip((self.key(text) for text in texts), vectors))
+        # More new entries than slots: keep the last ones
+        entries = dict(list(entries.items())[-self.max_entries:])
+        if not entries:
+            return
+        with self.locked(fcntl.LOCK_EX):
+            if self.dimension is None and not self.map_stored_vectors():
+                self.map_vectors(vectors.shape[1])
+                self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimension', ?)", (self.dimension,))
+            elif vectors.shape[1] != self.dimension:
+                print(f"Embedding cache holds {self.dimension}-d vectors, not caching {vectors.shape[1]}-d", file=sys.stderr)
+                return
+            
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Hits since the last flush count before picking what to evict
+                self.write_recent()
+                placeholders = ",".join("?" * len(entries))
+                present = {row[0] for row in self.conn.execute(f"SELECT key FROM entries WHERE key IN ({placeholders})", list(entries))}
+                new_keys = [key for key in entries if key not in present]
+                size = self.conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+                
+                free = min(len(new_keys), self.max_entries - size)
+                slots = list(range(size, size + free))
+                evict = len(new_keys) - free
+                if evict:
+                    victims = self.conn.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)).fetchall()
+                    self.conn.executemany("DELETE FROM entries WHERE key = ?", ((key,) for key, _ in victims))
+                    slots.extend(slot for _, slot in victims)
+                    self.counters["evictions"] += len(victims)
+                
+                for key, slot in zip(new_keys, slots):
+                    self.vectors[slot] = entries[key]
+                self.vectors.flush()
+                
+                now = time.time()
+                self.conn.executemany("INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                                      ((key, slot, now) for key, slot in zip(new_keys, slots)))
+                self.conn.execute("UPDATE meta SET value = ? WHERE name = 'size'", (size + free,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    def encode(self, model, texts: List[str], **kwargs) -> np.ndarray:
+        """model.encode(texts) with cached vectors reused and new ones stored"""
+        if not self.enabled or not texts:
+            return np.asarray(model.encode(texts, **kwargs), dtype="float32")
+        
+        try:
+            found = self.get_many(texts)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Embedding cache read error: {e}", file=sys.stderr)
+            self.counters["errors"] += 1
+            found = {}
+        
+        missing = [position for position in range(len(texts)) if position not in found]
+        self.counters["hits"] += len(texts) - len(missing)
+        self.counters["misses"] += len(missing)
+        if missing:
+            encoded = np.asarray(model.encode([texts[position] for position in missing], **kwargs), dtype="float32")
+            try:
+                self.put_many([texts[position] for position in missing], encoded)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Embedding cache write error: {e}", file=sys.stderr)
+                self.counters["errors"] += 1
+            found.update(zip(missing, encoded))
+        return np.stack([found[position] for position in range(len(texts))])
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "capacity": self.max_entries, **self.counters}
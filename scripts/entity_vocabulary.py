@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import re
+import sys
+import sqlite3
+from typing import List, Dict, Any
+import data_version
+import db
+
+# Columns whose distinct values are matched in user queries, in priority order
+ENTITY_COLUMNS = ["university", "program", "location"]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both entity matching and query signatures"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class EntityVocabulary:
+    """In-memory index of distinct university, program and location values,
+    reloaded whenever the universities table changes"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.version = None
+        self.phrases = {}
+        self.values = {column: [] for column in ENTITY_COLUMNS}
+        self.max_tokens = 0
+    
+    def refresh(self):
+        """Reload distinct values if file_processor.py has touched the table since the last load"""
+        version = data_version.read("universities")
+        if version == self.version:
+            return
+        
+        phrases = {}
+        values = {column: [] for column in ENTITY_COLUMNS}
+        try:
+            cursor = db.connect(self.db_path, read_only=True).cursor()
+            for column in ENTITY_COLUMNS:
+                cursor.execute(f"SELECT DISTINCT {column} FROM universities WHERE {column} IS NOT NULL")
+                for (value,) in cursor.fetchall():
+                    value = str(value).strip()
+                    tokens = tuple(tokenize(value))
+                    if not tokens:
+                        continue
+                    values[column].append(value)
+                    # Earlier columns win when the same phrase appears in several
+                    phrases.setdefault(tokens, (column, value))
+            cursor.close()
+        except sqlite3.Error as e:
+            # The version is left unrecorded so the next query tries again, e.g. once the table exists
+            print(f"Error loading entity vocabulary: {e}", file=sys.stderr)
+            return
+        
+        self.phrases = phrases
+        self.values = values
+        self.max_tokens = max((len(tokens) for tokens in phrases), default=0)
+        self.version = version
+        print(f"Entity vocabulary loaded with {len(phrases)} phrases", file=sys.stderr)
+    
+    def find(self, query: str) -> List[Dict[str, Any]]:
+        """Longest non-overlapping matches of known values in the query, in order"""
+        self.refresh()
+        tokens = tokenize(query)
+        matches = []
+        position = 0
+        while position < len(tokens):
+            for length in range(min(self.max_tokens, len(tokens) - position), 0, -1):
+                phrase = tuple(tokens[position:position + length])
+                if phrase in self.phrases:
+                    column, value = self.phrases[phrase]
+                    matches.append({"column": column, "value": value, "start": position, "end": position + length})
+                    position += length
+                    break
+            else:
+                position += 1
+        return matches
@@ -2,11 +2,12 @@
 import sys
 import json
 import os
-import sqlite3
-import pandas as pd
-import PyPDF2
 import datetime
+import math
+import time
 import pytz
+import data_version
+import db
 
 def main():
     try:
@@ -25,7 +26,7 @@ def main():
         elif file_ext == 'sql':
             result.update(process_sql_file(file_path))
         elif file_ext == 'pdf':
-            result.update(process_pdf_file(file_path))
+            result.update(process_pdf_file(file_path, index=data.get('index', PDF_AUTO_INDEX)))
         elif file_ext == 'txt':
             result.update(process_text_file(file_path, file_name))
         else:
@@ -33,7 +34,7 @@ def main():
             result["error"] = f"Unsupported file type: {file_ext}"
         
         print(json.dumps(result))
-        
+    
     except Exception as e:
         error_result = {
             "processed": False,
@@ -42,85 +43,305 @@ def main():
         print(json.dumps(error_result))
         sys.exit(1)
 
+# Columns of an uploaded CSV/XLSX, and the natural key rows are upserted on
+STRUCTURED_COLUMNS = ['university', 'program', 'tuition', 'location', 'visa_service']
+UPLOAD_CHUNK_ROWS = int(os.getenv('UPLOAD_CHUNK_ROWS', 5000))
+# Universities looked up per query, under SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+
 def process_structured_file(file_path: str, file_ext: str) -> dict:
-    """Process CSV or XLSX files"""
+    """Stream a CSV or XLSX into universities in chunks, upserting on (university, program)"""
     try:
-        # Read file
-        if file_ext == 'csv':
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.read_excel(file_path)
+        start_time = time.time()
+        columns, chunks = read_structured_chunks(file_path, file_ext, UPLOAD_CHUNK_ROWS)
         
         # Check for expected columns
-        expected_columns = ['university', 'program', 'tuition', 'location', 'visa_service']
-        if not all(col in df.columns for col in expected_columns):
+        if not all(col in columns for col in STRUCTURED_COLUMNS):
             return {
                 "processed": False,
-                "error": f"File must have columns: {', '.join(expected_columns)}"
+                "error": f"File must have columns: {', '.join(STRUCTURED_COLUMNS)}"
             }
         
-        # Initialize database
-        db_path = "data/chatbot.db"
-        conn = sqlite3.connect(db_path)
+        counts = {"read": 0, "inserted": 0, "updated": 0, "skipped": 0, "invalid": 0}
+        # One transaction for the whole file; chat workers keep reading the previous snapshot meanwhile
+        with db.transaction() as conn:
+            ensure_universities_table(conn)
+            for records in chunks:
+                counts["read"] += len(records)
+                rows = [row for row in map(coerce_row, records) if row is not None]
+                counts["invalid"] += len(records) - len(rows)
+                upsert_rows(conn, rows, counts)
+                print(f"Ingested {counts['read']} rows ({counts['inserted']} inserted, {counts['updated']} updated, "
+                      f"{counts['skipped']} skipped)", file=sys.stderr)
+        db.ensure_indexes(db.connect())
+        if counts["inserted"] or counts["updated"]:
+            data_version.bump("universities")
         
-        # Insert data
-        df.to_sql('universities', conn, if_exists='append', index=False)
-        conn.close()
+        elapsed = time.time() - start_time
         
+        def per_second(count: int) -> float:
+            return round(count / elapsed, 1) if elapsed else 0.0
         return {
-            "rows_inserted": len(df),
-            "columns": list(df.columns)
+            "rows_read": counts["read"],
+            "rows_inserted": counts["inserted"],
+            "rows_updated": counts["updated"],
+            # Unchanged rows, and rows superseded by a later row with the same key
+            "rows_skipped": counts["skipped"],
+            "rows_invalid": counts["invalid"],
+            "rows_per_sec": per_second(counts["read"]),
+            "inserted_per_sec": per_second(counts["inserted"]),
+            "updated_per_sec": per_second(counts["updated"]),
+            "skipped_per_sec": per_second(counts["skipped"] + counts["invalid"]),
+            "seconds": round(elapsed, 3),
+            "columns": columns
         }
-        
+    
     except Exception as e:
         return {"processed": False, "error": str(e)}
 
+def read_structured_chunks(file_path: str, file_ext: str, chunk_rows: int):
+    """Header columns and a generator of record lists, chunk_rows at a time"""
+    if file_ext == 'csv':
+        # pandas is only imported for CSV uploads
+        import pandas as pd
+        columns = [str(col).strip() for col in pd.read_csv(file_path, nrows=0).columns]
+        
+        def csv_chunks():
+            for chunk in pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+                chunk.columns = columns
+                yield chunk.to_dict("records")
+        return columns, csv_chunks()
+    
+    # Read-only openpyxl streams rows instead of loading the whole sheet
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    columns = [str(col).strip() if col is not None else "" for col in next(rows, ())]
+    
+    def xlsx_chunks():
+        try:
+            records = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                records.append(dict(zip(columns, row)))
+                if len(records) >= chunk_rows:
+                    yield records
+                    records = []
+            if records:
+                yield records
+        finally:
+            workbook.close()
+    return columns, xlsx_chunks()
+
+def clean_text(value):
+    """Stripped string, or None for blanks and NaN"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value).strip() or None
+
+def coerce_tuition(value):
+    """Tuition as an integer, accepting "$12,500"-style strings; None when it isn't a number"""
+    text = clean_text(value)
+    if text is None:
+        return None
+    try:
+        return int(round(float(text.replace(",", "").replace("$", ""))))
+    except ValueError:
+        return None
+
+def coerce_row(record: dict):
+    """(university, program, tuition, location, visa_service) with types coerced, or None without a key"""
+    university = clean_text(record.get('university'))
+    program = clean_text(record.get('program'))
+    if university is None or program is None:
+        return None
+    return (
+        university,
+        program,
+        coerce_tuition(record.get('tuition')),
+        clean_text(record.get('location')),
+        clean_text(record.get('visa_service'))
+    )
+
+def ensure_universities_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS universities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            university TEXT,
+            program TEXT,
+            tuition INTEGER,
+            location TEXT,
+            visa_service TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_universities_natural_key ON universities (university, program)")
+
+def existing_rows(conn, keys: set) -> dict:
+    """Current (tuition, location, visa_service) for each (university, program) key present in the table"""
+    universities = sorted({university for university, _ in keys})
+    existing = {}
+    for start in range(0, len(universities), LOOKUP_BATCH):
+        batch = universities[start:start + LOOKUP_BATCH]
+        placeholders = ",".join("?" * len(batch))
+        for university, program, *values in conn.execute(
+            f"SELECT university, program, tuition, location, visa_service FROM universities WHERE university IN ({placeholders})",
+            batch
+        ):
+            if (university, program) in keys:
+                existing[(university, program)] = tuple(values)
+    return existing
+
+def upsert_rows(conn, rows: list, counts: dict):
+    """Insert new keys and update changed ones with batched executemany, counting what happened"""
+    latest = {}
+    for row in rows:
+        if (row[0], row[1]) in latest:
+            counts["skipped"] += 1
+        latest[(row[0], row[1])] = row
+    
+    existing = existing_rows(conn, set(latest))
+    inserts, updates = [], []
+    for key, row in latest.items():
+        current = existing.get(key)
+        if current is None:
+            inserts.append(row)
+        elif current != row[2:]:
+            updates.append((*row[2:], *key))
+        else:
+            counts["skipped"] += 1
+    
+    conn.executemany(
+        "INSERT INTO universities (university, program, tuition, location, visa_service) VALUES (?, ?, ?, ?, ?)",
+        inserts
+    )
+    conn.executemany(
+        "UPDATE universities SET tuition = ?, location = ?, visa_service = ? WHERE university = ? AND program = ?",
+        updates
+    )
+    counts["inserted"] += len(inserts)
+    counts["updated"] += len(updates)
+
 def process_sql_file(file_path: str) -> dict:
     """Process SQL files"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             sql_content = f.read()
         
-        db_path = "data/chatbot.db"
-        conn = sqlite3.connect(db_path)
+        conn = db.connect()
         conn.executescript(sql_content)
         conn.commit()
-        conn.close()
+        db.ensure_indexes(conn)
+        data_version.bump("universities")
         
         return {"sql_executed": True}
-        
+    
     except Exception as e:
         return {"processed": False, "error": str(e)}
 
-def process_pdf_file(file_path: str) -> dict:
-    """Process PDF files"""
+# Pages per worker task, and the worker processes PDF extraction may use
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 16))
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', os.cpu_count() or 1))
+# Re-run the incremental indexer once the extracted text is saved
+PDF_AUTO_INDEX = os.getenv('PDF_AUTO_INDEX', '0') == '1'
+# Text between two pages in the extracted file
+PAGE_SEPARATOR = "\n\n"
+
+def process_pdf_file(file_path: str, index: bool = PDF_AUTO_INDEX) -> dict:
+    """Extract a PDF's text page by page, in parallel for large files, streaming pages to disk in order.
+    Page offsets are saved next to the text so chunks can be cited by page."""
     try:
+        import PyPDF2
+        start_time = time.time()
         with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        
-        if not text.strip():
-            return {"processed": False, "error": "No text extracted from PDF"}
+            page_count = len(PyPDF2.PdfReader(f).pages)
         
-        # Save extracted text
         os.makedirs("scraped_data", exist_ok=True)
         timestamp = datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y%m%d_%H%M')
         text_file = f"scraped_data/pdf_upload_{timestamp}.txt"
+        pages_file = f"scraped_data/pdf_upload_{timestamp}.pages.json"
         
-        with open(text_file, "w", encoding="utf-8") as f:
-            f.write(text)
+        # Written under a name the indexer skips, then renamed once complete
+        pages = []
+        length = 0
+        with open(f"{text_file}.tmp", "w", encoding="utf-8") as out:
+            for page_number, text in iter_pdf_pages(file_path, page_count):
+                if text and length:
+                    out.write(PAGE_SEPARATOR)
+                    length += len(PAGE_SEPARATOR)
+                out.write(text)
+                pages.append({"page": page_number, "start": length, "end": length + len(text)})
+                length += len(text)
         
-        return {
+        if not length:
+            os.remove(f"{text_file}.tmp")
+            return {"processed": False, "error": "No text extracted from PDF"}
+        
+        with open(pages_file, "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.basename(text_file), "pages": pages}, f)
+        os.replace(f"{text_file}.tmp", text_file)
+        
+        seconds = time.time() - start_time
+        result = {
             "text_extracted": True,
-            "text_length": len(text),
-            "saved_to": text_file
+            "text_length": length,
+            "pages": page_count,
+            "pages_with_text": sum(1 for page in pages if page["end"] > page["start"]),
+            "pages_per_sec": round(page_count / seconds, 1) if seconds else None,
+            "seconds": round(seconds, 3),
+            "saved_to": text_file,
+            "pages_file": pages_file
         }
-        
+        if index:
+            result["index"] = index_new_text()
+        return result
+    
     except Exception as e:
         return {"processed": False, "error": str(e)}
 
+def extract_page_range(file_path: str, start: int, end: int) -> list:
+    """(page number, text) for pages start..end-1; runs in a worker process with its own reader"""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(number + 1, (reader.pages[number].extract_text() or "").strip()) for number in range(start, end)]
+
+def iter_pdf_pages(file_path: str, page_count: int):
+    """Yield (page number, text) in page order, extracting ranges of pages in a process pool
+    and keeping only a bounded window of ranges in flight"""
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    workers = min(PDF_WORKERS, len(ranges))
+    if workers <= 1:
+        for start, end in ranges:
+            yield from extract_page_range(file_path, start, end)
+        return
+    
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = iter(ranges)
+        for page_range in remaining:
+            pending.append(executor.submit(extract_page_range, file_path, *page_range))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            page_range = next(remaining, None)
+            if page_range:
+                pending.append(executor.submit(extract_page_range, file_path, *page_range))
+            print(f"Extracted pages up to {pages[-1][0]} of {page_count}", file=sys.stderr)
+            yield from pages
+
+def index_new_text() -> dict:
+    """Run the incremental indexer, which embeds only files that are new or changed"""
+    try:
+        from data_indexer import load_and_index_data
+        return load_and_index_data()
+    except Exception as e:
+        print(f"Indexing after upload failed: {e}", file=sys.stderr)
+        return {"success": False, "error": str(e)}
+
 def process_text_file(file_path: str, file_name: str) -> dict:
     """Process text files"""
     try:
@@ -143,7 +364,7 @@ def process_text_file(file_path: str, file_name: str) -> dict:
             "text_length": len(content),
             "saved_to": final_path
         }
-        
+    
     except Exception as e:
         return {"processed": False, "error": str(e)}
 
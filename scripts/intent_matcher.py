@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import os
+import re
+from typing import List, Dict, Any, Optional
+from entity_vocabulary import EntityVocabulary, tokenize
+
+# Keywords that name the field a question asks about
+FIELD_KEYWORDS = {
+    "tuition": {"tuition", "fee", "fees", "cost", "costs", "price", "expensive", "afford", "pay"},
+    "program": {"program", "programs", "programme", "programmes", "course", "courses", "major", "majors", "degree", "degrees"},
+    "location": {"where", "location", "located", "campus", "city", "address"},
+    "visa_service": {"visa", "visas", "f-1", "sponsorship", "immigration"}
+}
+
+LIST_KEYWORDS = {"universities", "university", "schools", "school", "colleges", "college", "which", "list"}
+BELOW_KEYWORDS = {"under", "below", "less", "cheaper", "max", "maximum"}
+ABOVE_KEYWORDS = {"over", "above", "more", "greater", "min", "minimum"}
+
+# Words that need reasoning the templates below can't express
+COMPLEX_KEYWORDS = {"not", "except", "without", "cheapest", "average", "most", "least", "best", "rank", "ranking", "why", "how"}
+
+# Anything that looks like an amount, e.g. "55,000", "$55,000." or "55k"; validated by AMOUNT_PATTERN
+NUMBER_PATTERN = re.compile(r"\$?\d[\d,.]*(?:k\b)?", re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r"\$?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?(k)?", re.IGNORECASE)
+
+# Function words and generic verbs that carry no meaning the templates could miss
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "what", "what's", "which", "i", "me", "my",
+    "you", "your", "we", "it", "its", "of", "for", "at", "in", "on", "to", "from", "and", "or", "with", "about",
+    "tell", "show", "give", "please", "can", "could", "there", "their", "this", "that", "much", "any", "all",
+    "has", "have", "offer", "offers", "offered", "study", "teach", "teaches"
+}
+KNOWN_WORDS = FILLER_WORDS | LIST_KEYWORDS | BELOW_KEYWORDS | ABOVE_KEYWORDS | COMPLEX_KEYWORDS | set().union(*FIELD_KEYWORDS.values())
+# Confidence lost for each word no entity or keyword accounts for, e.g. "documents" or "scholarships"
+UNEXPLAINED_PENALTY = 0.15
+
+class IntentMatcher:
+    """Rule-based matcher that answers common lookups on the universities table without Gemini"""
+    
+    def __init__(self, vocabulary: EntityVocabulary, threshold: float = None):
+        self.vocabulary = vocabulary
+        self.threshold = threshold if threshold is not None else float(os.getenv('INTENT_CONFIDENCE', 0.75))
+        self.counters = {"matched": 0, "deferred": 0}
+    
+    def match(self, query: str, entities: List[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """SQL with bound parameters for a confident match, or None to defer to Gemini"""
+        candidate = self.classify(query, entities)
+        if not candidate or candidate["confidence"] < self.threshold:
+            self.counters["deferred"] += 1
+            return None
+        self.counters["matched"] += 1
+        return candidate
+    
+    def classify(self, query: str, entities: List[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Best intent for the query with a confidence score"""
+        if entities is None:
+            entities = self.vocabulary.find(query)
+        tokens = set(tokenize(query))
+        by_column = {}
+        for entity in entities:
+            by_column.setdefault(entity["column"], []).append(entity["value"])
+        
+        fields = [field for field, keywords in FIELD_KEYWORDS.items() if tokens & keywords]
+        penalty = 0.5 if tokens & COMPLEX_KEYWORDS else 0.0
+        # A question about something the table doesn't hold still mentions a university and a field
+        penalty += UNEXPLAINED_PENALTY * len(self.unexplained_words(query, entities))
+        universities = by_column.get("university", [])
+        
+        if universities:
+            # Facts about named universities; a named program or location is a filter, not a field
+            fields = [field for field in fields if field not in by_column]
+            if not fields:
+                return None
+            return self.university_lookup(universities, fields, by_column, 0.9 - penalty)
+        
+        filters = []
+        params = []
+        for column in ("program", "location"):
+            values = by_column.get(column, [])
+            if values:
+                filters.append(self.condition(column, values))
+                params.extend(values)
+        
+        if "tuition" in fields and tokens & (BELOW_KEYWORDS | ABOVE_KEYWORDS) and NUMBER_PATTERN.search(query):
+            amount = self.amount(query)
+            if amount is None:
+                return None
+            filters.append("tuition < ?" if tokens & BELOW_KEYWORDS else "tuition > ?")
+            params.append(amount)
+        
+        if not filters:
+            return None
+        
+        # Lists of universities matching a program, location or tuition bound
+        columns = ["university"]
+        for field in fields:
+            if field not in columns and field not in by_column:
+                columns.append(field)
+        confidence = (0.85 if tokens & LIST_KEYWORDS or len(columns) > 1 else 0.6) - penalty
+        return {
+            "intent": "list",
+            "sql": f"SELECT {', '.join(columns)} FROM universities WHERE {' AND '.join(filters)}",
+            "params": params,
+            "confidence": confidence
+        }
+    
+    @staticmethod
+    def unexplained_words(query: str, entities: List[Dict[str, Any]]) -> List[str]:
+        """Content words of the query that are neither part of a matched entity nor a known keyword"""
+        covered = {position for entity in entities for position in range(entity.get("start", 0), entity.get("end", 0))}
+        return [
+            token for position, token in enumerate(tokenize(query))
+            if position not in covered and not token.rstrip("k").isdigit() and token not in KNOWN_WORDS
+        ]
+    
+    @staticmethod
+    def amount(query: str) -> Optional[int]:
+        """The one whole-dollar amount in the raw query, or None when there are several or it doesn't parse cleanly"""
+        numbers = [number.rstrip(",.") for number in NUMBER_PATTERN.findall(query)]
+        if len(numbers) != 1:
+            return None
+        match = AMOUNT_PATTERN.fullmatch(numbers[0])
+        if not match:
+            return None
+        whole, fraction, thousands = match.groups()
+        value = float(whole.replace(",", "") + (fraction or "")) * (1000 if thousands else 1)
+        return int(value) if value.is_integer() else None
+    
+    def university_lookup(self, universities: List[str], fields: List[str], by_column: Dict[str, List[str]], confidence: float) -> Dict[str, Any]:
+        filters = [self.condition("university", universities)]
+        params = list(universities)
+        # A named program narrows the row, e.g. "tuition for Computer Science at MIT"
+        if by_column.get("program"):
+            filters.append(self.condition("program", by_column["program"]))
+            params.extend(by_column["program"])
+        
+        columns = fields if len(universities) == 1 and len(fields) == 1 else ["university"] + fields
+        return {
+            "intent": "lookup",
+            "sql": f"SELECT {', '.join(columns)} FROM universities WHERE {' AND '.join(filters)}",
+            "params": params,
+            "confidence": confidence
+        }
+    
+    @staticmethod
+    def condition(column: str, values: List[str]) -> str:
+        if len(values) == 1:
+            return f"{column} = ?"
+        return f"{column} IN ({', '.join('?' for _ in values)})"
+    
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import os
+import sys
+import sqlite3
+import threading
+from typing import List, Iterable
+from entity_vocabulary import tokenize
+
+LEXICAL_PATH = "vectorstore/lexical.db"
+
+# Query terms past this many are ignored
+MAX_QUERY_TERMS = 32
+
+def match_query(query: str) -> str:
+    """FTS5 MATCH expression that ORs the query's terms, each quoted so punctuation can't break the syntax"""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def fts5_available() -> bool:
+    """Whether this SQLite build has FTS5"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+class LexicalIndex:
+    """Read-only BM25 search over chunk texts, keyed by the same ids as the FAISS index"""
+    
+    def __init__(self, path: str = LEXICAL_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        # Searches come from executor threads
+        self.lock = threading.Lock()
+    
+    def search(self, query: str, k: int) -> List[int]:
+        """Ids of the best BM25 matches, best first"""
+        expression = match_query(query)
+        if not expression:
+            return []
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                    (expression, k)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Lexical search error: {e}", file=sys.stderr)
+            return []
+        return [row[0] for row in rows]
+    
+    def close(self):
+        self.conn.close()
+
+class LexicalIndexWriter:
+    """Applies one indexing run to the FTS5 table in a single transaction.
+    A rebuild is written to a temporary file and moved into place on commit."""
+    
+    def __init__(self, path: str = LEXICAL_PATH, rebuild: bool = False):
+        self.path = path
+        self.write_path = f"{path}.tmp" if rebuild else path
+        if rebuild and os.path.exists(self.write_path):
+            os.remove(self.write_path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        
+        self.conn = sqlite3.connect(self.write_path)
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, tokenize='porter unicode61')")
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: retrieval falls back to vectors only
+            print(f"Lexical index disabled: {e}", file=sys.stderr)
+            self.abort()
+    
+    def remove(self, ids: Iterable[int]):
+        if self.conn:
+            self.conn.executemany("DELETE FROM chunks_fts WHERE rowid = ?", ((int(chunk_id),) for chunk_id in ids))
+    
+    def add(self, chunk_id: int, text: str):
+        if self.conn:
+            self.conn.execute("INSERT INTO chunks_fts(rowid, text) VALUES (?, ?)", (int(chunk_id), text))
+    
+    def commit(self):
+        if not self.conn:
+            return
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+        if self.write_path != self.path:
+            os.replace(self.write_path, self.path)
+    
+    def abort(self):
+        if not self.conn:
+            return
+        self.conn.rollback()
+        self.conn.close()
+        self.conn = None
+        if self.write_path != self.path and os.path.exists(self.write_path):
+            os.remove(self.write_path)
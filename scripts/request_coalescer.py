@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import threading
+from typing import Dict, Any, Callable
+from response_cache import ResponseCache
+
+# Identical chat requests arriving while one is being answered share its answer
+COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', '1') == '1'
+# Seconds a follower waits for the shared answer before running on its own
+COALESCE_WAIT = float(os.getenv('COALESCE_WAIT', 10))
+
+def coalesce_key(request: Dict[str, Any]) -> tuple:
+    """What the answer depends on: the normalized message, the language, the user turns
+    the RAG prompt includes, and whether the reply is streamed"""
+    history = tuple(
+        ResponseCache.normalize(msg.get('content', ''))
+        for msg in (request.get('history') or [])[-3:] if msg.get('type') == 'user'
+    )
+    return (bool(request.get('stream')), request.get('language', 'en'),
+            ResponseCache.normalize(request.get('message', '')), history)
+
+def is_final(request: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    return not request.get('stream') or event.get('type') == 'done'
+
+class Follower:
+    def __init__(self, request: Dict[str, Any], reply: Callable[[Dict[str, Any]], None]):
+        self.request = request
+        self.reply = reply
+        self.joined = time.time()
+        # Once a streamed event has been forwarded the follower is committed to this flight
+        self.forwarded = False
+
+class Flight:
+    """One request being answered, with the events it has produced so far and the requests waiting on it"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.followers = []
+        self.done = False
+
+class RequestCoalescer:
+    """Single-flight front for a dispatcher: the first of several identical chat requests is dispatched,
+    the rest receive copies of its events. A follower that has received nothing after max_wait seconds
+    is dispatched on its own instead."""
+    
+    def __init__(self, dispatch: Callable, on_follower_done: Callable = None, max_wait: float = COALESCE_WAIT):
+        self.dispatch = dispatch
+        self.on_follower_done = on_follower_done
+        self.max_wait = max_wait
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {"leaders": 0, "followers": 0, "fallbacks": 0}
+        threading.Thread(target=self.watchdog, daemon=True).start()
+    
+    def submit(self, request: Dict[str, Any], reply: Callable[[Dict[str, Any]], None]):
+        key = coalesce_key(request)
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.counters["leaders"] += 1
+            else:
+                self.counters["followers"] += 1
+        
+        if leader:
+            try:
+                self.dispatch(request, lambda event: self.deliver(key, flight, request, event, reply))
+            except Exception as e:
+                # Nothing will finish this flight, so nothing would ever reach its followers either
+                with self.lock:
+                    if self.flights.get(key) is flight:
+                        del self.flights[key]
+                with flight.lock:
+                    flight.done = True
+                    stranded, flight.followers = flight.followers, []
+                for follower in stranded:
+                    if follower.forwarded:
+                        # Part of a stream already went out; end it rather than replay it from the start
+                        self.forward(follower, {"type": "done", "success": False, "error": str(e)}, True)
+                    else:
+                        self.fall_back(follower)
+                raise
+            return
+        
+        follower = Follower(request, reply)
+        with flight.lock:
+            # Events the flight already produced are replayed; a flight that just finished replays in full
+            for event in flight.events:
+                self.forward(follower, event, is_final(request, event))
+            if not flight.done:
+                flight.followers.append(follower)
+    
+    def deliver(self, key: tuple, flight: Flight, request: Dict[str, Any], event: Dict[str, Any], reply):
+        """Pass one of the leader's events to the leader, then to every follower"""
+        final = is_final(request, event)
+        if final:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+        reply(event)
+        with flight.lock:
+            flight.events.append(event)
+            flight.done = final
+            for follower in flight.followers:
+                self.forward(follower, event, final)
+            if final:
+                flight.followers = []
+    
+    def forward(self, follower: Follower, event: Dict[str, Any], final: bool):
+        follower.forwarded = True
+        if final:
+            # The follower's own latency is the time it waited; the stage timings belong to the leader
+            waited = round(time.time() - follower.joined, 3)
+            timings_key = "timing" if follower.request.get('stream') else "timings"
+            event = {**event, "coalesced": True, timings_key: {"coalesced_wait": waited, "total": waited}}
+            if self.on_follower_done:
+                self.on_follower_done(follower.request, event)
+        try:
+            follower.reply(event)
+        except Exception as e:
+            # One follower's broken connection must not keep the answer from the others
+            print(f"Error replying to coalesced request: {e}", file=sys.stderr)
+    
+    def watchdog(self):
+        """Dispatch followers that have waited too long without receiving anything on their own"""
+        while True:
+            time.sleep(0.25)
+            now = time.time()
+            with self.lock:
+                flights = list(self.flights.values())
+            
+            expired = []
+            for flight in flights:
+                with flight.lock:
+                    waiting = [follower for follower in flight.followers
+                               if not follower.forwarded and now - follower.joined > self.max_wait]
+                    flight.followers = [follower for follower in flight.followers if follower not in waiting]
+                expired += waiting
+            
+            for follower in expired:
+                print(f"Coalesced request waited over {self.max_wait}s, running it separately", file=sys.stderr)
+                self.fall_back(follower)
+    
+    def fall_back(self, follower: Follower):
+        """Dispatch a follower on its own"""
+        with self.lock:
+            self.counters["fallbacks"] += 1
+        threading.Thread(target=self.dispatch, args=(follower.request, follower.reply), daemon=True).start()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.counters, "in_flight": len(self.flights)}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import os
+import sys
+import threading
+from typing import List, Dict, Any, Tuple
+
+# Final chunks sent to Gemini, and candidates taken from each retriever before fusion
+RAG_TOP_K = int(os.getenv('RAG_TOP_K', 3))
+RAG_CANDIDATES = int(os.getenv('RAG_CANDIDATES', 20))
+# Standard RRF damping constant; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Merge ranked id lists by summing 1 / (k + rank), best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class Reranker:
+    """Optional local cross-encoder (RERANKER_MODEL, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2)
+    that rescores fused candidates against the query"""
+    
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name if model_name is not None else os.getenv('RERANKER_MODEL', '')
+        self.model = None
+        self.lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model_name)
+    
+    def load(self):
+        """Load the cross-encoder, disabling reranking if it can't be loaded"""
+        if not self.enabled or self.model is not None:
+            return
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name)
+            print(f"Reranker {self.model_name} loaded", file=sys.stderr)
+        except Exception as e:
+            print(f"Error loading reranker {self.model_name}: {e}", file=sys.stderr)
+            self.model_name = ''
+    
+    def rerank(self, query: str, chunks: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """The top_k chunks by cross-encoder score, or the first top_k when reranking is off"""
+        if not self.enabled or len(chunks) <= 1:
+            return chunks[:top_k]
+        with self.lock:
+            self.load()
+            if self.model is None:
+                return chunks[:top_k]
+            scores = self.model.predict([(query, chunk["text"]) for chunk in chunks])
+        for chunk, score in zip(chunks, scores):
+            chunk["rerank_score"] = float(score)
+        return sorted(chunks, key=lambda chunk: chunk["rerank_score"], reverse=True)[:top_k]
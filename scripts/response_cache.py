@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+# numpy is imported where embeddings are compared; it is already loaded by then
+import data_version
+
+class ResponseCache:
+    """LRU cache of chat answers keyed on the normalized English query and language,
+    with a second tier that matches near-duplicate questions by embedding similarity"""
+    
+    def __init__(self, max_entries: int = None, ttl: float = None, similarity: float = None):
+        self.max_entries = max_entries or int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+        self.ttl = ttl or float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+        # Cosine similarity needed for a semantic hit; above 1.0 disables the second tier
+        self.similarity = similarity if similarity is not None else float(os.getenv('RESPONSE_CACHE_SIMILARITY', 0.92))
+        self.entries = OrderedDict()
+        self.version = data_version.snapshot()
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(re.sub(r"[^\w\s-]", " ", query.lower()).split())
+    
+    def check_version(self):
+        """Drop everything once the vectorstore or universities table has changed"""
+        version = data_version.snapshot()
+        if version != self.version:
+            if self.entries:
+                self.counters["invalidations"] += 1
+            self.entries.clear()
+            self.version = version
+    
+    def get(self, english_query: str, language: str, embedding=None, entities: frozenset = None) -> Optional[Dict[str, Any]]:
+        """Return a cached result for this query, or None on a miss. A similar question only hits
+        when it names the same universities, programs and locations: "tuition at MIT" and
+        "tuition at Stanford" embed close together but have different answers."""
+        self.check_version()
+        now = time.time()
+        key = (self.normalize(english_query), language)
+        
+        entry = self.entries.get(key)
+        if entry and entry["expires"] > now:
+            self.entries.move_to_end(key)
+            self.counters["exact_hits"] += 1
+            return entry["result"]
+        if entry:
+            del self.entries[key]
+        
+        if embedding is not None and self.similarity <= 1.0:
+            match = self.find_similar(embedding, language, now, entities)
+            if match is not None:
+                self.entries.move_to_end(match)
+                self.counters["semantic_hits"] += 1
+                return self.entries[match]["result"]
+        
+        self.counters["misses"] += 1
+        return None
+    
+    def find_similar(self, embedding, language: str, now: float, entities: frozenset = None):
+        """Key of the most similar live entry in the same language and with the same entities above the threshold"""
+        keys = [
+            key for key, entry in self.entries.items()
+            if key[1] == language and entry["embedding"] is not None and entry["expires"] > now
+            and entry["entities"] == entities
+        ]
+        if not keys:
+            return None
+        
+        import numpy as np
+        matrix = np.stack([self.entries[key]["embedding"] for key in keys])
+        scores = matrix @ self.unit(embedding)
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.similarity else None
+    
+    @staticmethod
+    def unit(embedding):
+        import numpy as np
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def put(self, english_query: str, language: str, result: Dict[str, Any], embedding=None, entities: frozenset = None):
+        """Cache a successful result, evicting the least recently used entries past the size limit"""
+        self.check_version()
+        key = (self.normalize(english_query), language)
+        self.entries[key] = {
+            "result": result,
+            "embedding": self.unit(embedding) if embedding is not None else None,
+            "entities": entities,
+            "expires": time.time() + self.ttl
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.counters["exact_hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+        hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+        return {
+            **self.counters,
+            "size": len(self.entries),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
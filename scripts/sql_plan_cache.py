@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import re
+import sys
+import json
+import sqlite3
+import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import data_version
+import db
+from entity_vocabulary import tokenize
+
+# Filler words dropped from signatures so rephrasings share one plan
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "what's", "whats", "please", "tell", "me",
+    "about", "of", "for", "at", "in", "on", "to", "do", "does", "can", "i", "you", "show", "give"
+}
+
+LITERAL_PATTERN = re.compile(r"'((?:[^']|'')*)'")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+class SqlPlanCache:
+    """Generated SQL stored as parameterized templates, keyed by a query signature
+    in which university, program, location and number mentions become slots"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.plans = {}
+        self.negative = set()
+        self.version = data_version.read("universities")
+        self.counters = {"hits": 0, "misses": 0, "stored": 0}
+        self.setup_table()
+    
+    def setup_table(self):
+        try:
+            with db.transaction(self.db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS sql_plan_cache (
+                        signature TEXT PRIMARY KEY,
+                        template TEXT,
+                        slots TEXT,
+                        created_at TEXT
+                    )
+                """)
+        except sqlite3.Error as e:
+            print(f"Error creating sql_plan_cache table: {e}", file=sys.stderr)
+    
+    @staticmethod
+    def signature(query: str, entities: List[Dict[str, Any]]) -> Tuple[str, Dict[str, List[str]]]:
+        """Query shape with entity and number mentions replaced by slots, plus the lifted values"""
+        tokens = tokenize(query)
+        lifted = {}
+        parts = []
+        position = 0
+        for entity in entities + [{"start": len(tokens), "end": len(tokens)}]:
+            for token in tokens[position:entity["start"]]:
+                if NUMBER_PATTERN.fullmatch(token):
+                    lifted.setdefault("number", []).append(token)
+                    parts.append("{number}")
+                elif token not in STOPWORDS:
+                    parts.append(token)
+            if "column" in entity:
+                lifted.setdefault(entity["column"], []).append(entity["value"])
+                parts.append("{" + entity["column"] + "}")
+            position = entity["end"]
+        return " ".join(parts), lifted
+    
+    def check_version(self):
+        """Plans that found no SQL may become answerable once the table changes"""
+        version = data_version.read("universities")
+        if version != self.version:
+            self.negative.clear()
+            self.version = version
+    
+    def lookup(self, signature: str, lifted: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        """Bound plan for this signature: {"sql", "params"}, {"sql": None} for a known miss, or None"""
+        self.check_version()
+        if signature in self.negative:
+            self.counters["hits"] += 1
+            return {"sql": None, "params": []}
+        
+        plan = self.plans.get(signature) or self.load(signature)
+        if not plan:
+            self.counters["misses"] += 1
+            return None
+        
+        try:
+            params = self.bind(plan["slots"], lifted)
+        except (KeyError, IndexError):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return {"sql": plan["template"], "params": params}
+    
+    def load(self, signature: str) -> Optional[Dict[str, Any]]:
+        """Fetch a plan another worker stored"""
+        try:
+            row = db.connect(self.db_path, read_only=True).execute(
+                "SELECT template, slots FROM sql_plan_cache WHERE signature = ?", (signature,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading SQL plan cache: {e}", file=sys.stderr)
+            return None
+        if not row:
+            return None
+        plan = {"template": row[0], "slots": json.loads(row[1])}
+        self.plans[signature] = plan
+        return plan
+    
+    def remember_miss(self, signature: str):
+        """Remember that Gemini found no SQL for this query shape"""
+        self.negative.add(signature)
+    
+    def learn(self, signature: str, lifted: Dict[str, List[str]], sql_query: str) -> Dict[str, Any]:
+        """Turn generated SQL into a template; the plan carries its slots when every lifted value
+        became a parameter, and is kept only once store() sees it execute"""
+        template, slots = self.parameterize(sql_query, lifted)
+        params = self.bind(slots, lifted)
+        
+        lifted_count = sum(len(values) for values in lifted.values())
+        if len(slots) < lifted_count or len({(slot["kind"], slot["index"]) for slot in slots}) < lifted_count:
+            # Some value stayed inline, so the SQL only fits this exact query
+            return {"sql": template, "params": params}
+        return {"sql": template, "params": params, "slots": slots}
+    
+    def store(self, signature: str, plan: Dict[str, Any]):
+        """Keep a learned plan after its SQL executed without error"""
+        if "slots" not in plan:
+            return
+        self.plans[signature] = {"template": plan["sql"], "slots": plan["slots"]}
+        self.counters["stored"] += 1
+        try:
+            with db.transaction(self.db_path) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sql_plan_cache (signature, template, slots, created_at) VALUES (?, ?, ?, ?)",
+                    (signature, plan["sql"], json.dumps(plan["slots"]), datetime.datetime.now().isoformat())
+                )
+        except sqlite3.Error as e:
+            print(f"Error storing SQL plan: {e}", file=sys.stderr)
+    
+    def forget(self, signature: str):
+        """Drop a cached plan whose SQL failed to execute, so the next query of this shape asks Gemini again"""
+        self.plans.pop(signature, None)
+        try:
+            with db.transaction(self.db_path) as conn:
+                conn.execute("DELETE FROM sql_plan_cache WHERE signature = ?", (signature,))
+        except sqlite3.Error as e:
+            print(f"Error removing SQL plan: {e}", file=sys.stderr)
+    
+    @staticmethod
+    def bind(slots: List[Dict[str, Any]], lifted: Dict[str, List[str]]) -> List[Any]:
+        """Parameter values for a template's slots"""
+        params = []
+        for slot in slots:
+            value = lifted[slot["kind"]][slot["index"]]
+            if slot["kind"] == "number":
+                params.append(float(value) if "." in value else int(value))
+            else:
+                params.append(slot["pattern"].replace("{}", value))
+        return params
+    
+    @staticmethod
+    def parameterize(sql_query: str, lifted: Dict[str, List[str]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Replace literals matching lifted values with ? placeholders"""
+        lookup = {}
+        for kind, values in lifted.items():
+            for index, value in enumerate(values):
+                lookup.setdefault(value.lower(), (kind, index))
+        
+        slots = []
+        
+        def replace_number(match):
+            slot = lookup.get(match.group(0).lower())
+            if not slot or slot[0] != "number":
+                return match.group(0)
+            slots.append({"kind": slot[0], "index": slot[1], "pattern": "{}"})
+            return "?"
+        
+        def replace_literal(match):
+            value = match.group(1).replace("''", "'")
+            core = value.strip("%")
+            slot = lookup.get(core.lower())
+            if not slot:
+                return match.group(0)
+            # Keep LIKE wildcards around the bound value
+            prefix = value[:len(value) - len(value.lstrip("%"))]
+            suffix = value[len(value.rstrip("%")):]
+            slots.append({"kind": slot[0], "index": slot[1], "pattern": prefix + "{}" + suffix})
+            return "?"
+        
+        # Walk literal and non-literal segments in order so slots match placeholder order
+        pieces = []
+        position = 0
+        for match in LITERAL_PATTERN.finditer(sql_query):
+            pieces.append(NUMBER_PATTERN.sub(replace_number, sql_query[position:match.start()]))
+            pieces.append(replace_literal(match))
+            position = match.end()
+        pieces.append(NUMBER_PATTERN.sub(replace_number, sql_query[position:]))
+        return "".join(pieces), slots
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "size": len(self.plans), "negative": len(self.negative)}
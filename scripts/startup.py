@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import sys
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Set when the first entry-point module imports this one
+STARTED = time.time()
+
+components = {}
+
+def record(component: str, seconds: float, lazy: bool = False):
+    """Store how long a component took to import and initialize"""
+    components[component] = {"seconds": round(seconds, 3), "lazy": lazy}
+
+@contextmanager
+def timed(component: str, lazy: bool = False):
+    """Time the block as one component; lazy ones were loaded on first use rather than at startup"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        record(component, time.time() - start, lazy)
+
+def report() -> Dict[str, Any]:
+    """Per-component startup times and the total since this module was imported"""
+    startup = [entry["seconds"] for entry in components.values() if not entry["lazy"]]
+    return {"components": dict(components), "startup_seconds": round(sum(startup), 3),
+            "since_start": round(time.time() - STARTED, 3)}
+
+def print_report(label: str):
+    print(f"{label} startup: {json.dumps(report())}", file=sys.stderr)
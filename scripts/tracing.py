@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Upper bounds of the exported histogram buckets, in seconds
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+# Recent samples per stage the percentiles are computed from
+WINDOW = int(os.getenv('METRICS_WINDOW', 2048))
+QUANTILES = [0.5, 0.95, 0.99]
+# Optional file the Prometheus text is rewritten to, at most every METRICS_FILE_INTERVAL seconds
+METRICS_FILE = os.getenv('METRICS_FILE')
+METRICS_FILE_INTERVAL = float(os.getenv('METRICS_FILE_INTERVAL', 15))
+
+class Trace:
+    """Seconds spent in each named stage of one request; repeated spans add up"""
+    
+    def __init__(self):
+        self.spans = {}
+        # Spans of the async pipeline finish on executor threads
+        self.lock = threading.Lock()
+    
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+    
+    def rounded(self) -> Dict[str, float]:
+        with self.lock:
+            return {name: round(seconds, 3) for name, seconds in self.spans.items()}
+
+_current = contextvars.ContextVar("trace", default=None)
+
+def start() -> Trace:
+    """Begin a trace for the request running in this context"""
+    trace = Trace()
+    _current.set(trace)
+    return trace
+
+def add(name: str, seconds: float):
+    """Record a stage measured by the caller, for spans that cannot wrap a block"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+@contextmanager
+def span(name: str):
+    """Time the block as one stage of the current request's trace"""
+    started = time.time()
+    try:
+        yield
+    finally:
+        add(name, time.time() - started)
+
+def spans() -> Dict[str, float]:
+    """Stage timings of the current trace, rounded for results"""
+    trace = _current.get()
+    return trace.rounded() if trace is not None else {}
+
+def in_context(function):
+    """Bind function to a copy of the calling context, so work handed to a thread pool joins this trace"""
+    return functools.partial(contextvars.copy_context().run, function)
+
+class LatencyHistogram:
+    """Cumulative bucket counts for export plus a window of recent samples for percentiles"""
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=WINDOW)
+    
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.samples.append(seconds)
+    
+    def quantiles(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {}
+        return {f"p{int(q * 100)}": round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3) for q in QUANTILES}
+
+class Metrics:
+    """Per-stage latency histograms and per-route counts across all requests this process has answered"""
+    
+    def __init__(self):
+        self.stages = {}
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.written_at = 0.0
+    
+    def observe(self, route: str, timings: Dict[str, Any]):
+        """Add one finished request's stage timings"""
+        with self.lock:
+            self.routes[route] = self.routes.get(route, 0) + 1
+            for stage, seconds in timings.items():
+                if isinstance(seconds, (int, float)):
+                    self.stages.setdefault(stage, LatencyHistogram()).observe(seconds)
+        if METRICS_FILE and time.time() - self.written_at >= METRICS_FILE_INTERVAL:
+            self.write_file(METRICS_FILE)
+    
+    def summary(self) -> Dict[str, Any]:
+        """p50/p95/p99 and sample counts per stage"""
+        with self.lock:
+            return {
+                "routes": dict(self.routes),
+                "stages": {stage: {"count": histogram.count, **histogram.quantiles()} for stage, histogram in self.stages.items()}
+            }
+    
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the histograms and route counters"""
+        lines = [
+            "# HELP chat_requests_total Chat requests answered, by route.",
+            "# TYPE chat_requests_total counter"
+        ]
+        with self.lock:
+            for route, count in sorted(self.routes.items()):
+                lines.append(f'chat_requests_total{{route="{route}"}} {count}')
+            lines += [
+                "# HELP chat_stage_seconds Time spent in each stage of the chat pipeline.",
+                "# TYPE chat_stage_seconds histogram"
+            ]
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'chat_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'chat_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'chat_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+    
+    def write_file(self, path: str):
+        self.written_at = time.time()
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Error writing metrics file: {e}", file=sys.stderr)
+
+METRICS = Metrics()
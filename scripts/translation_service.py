@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import importlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+# Lines packed into one backend request, under Google's 5000 character limit
+BATCH_CHARS = int(os.getenv('TRANSLATION_BATCH_CHARS', 4500))
+# Recent translations also kept in process, in front of the SQLite cache
+MEMORY_ENTRIES = 2048
+# Inserts between trims of the SQLite cache back to its size limit
+PRUNE_INTERVAL = 100
+
+class GoogleBackend:
+    """deep_translator's GoogleTranslator, sending several lines per request"""
+    
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        from deep_translator import GoogleTranslator
+        translator = GoogleTranslator(source=source, target=target)
+        results = []
+        for batch in pack_lines(texts, BATCH_CHARS):
+            if len(batch) == 1:
+                results.append(translator.translate(batch[0]))
+                continue
+            lines = translator.translate("\n".join(batch)).split("\n")
+            if len(lines) != len(batch):
+                # The translator merged or split lines; fall back to one request per line
+                lines = [translator.translate(text) for text in batch]
+            results.extend(line.strip() for line in lines)
+        return results
+
+class OfflineBackend:
+    """Returns texts unchanged, for tests and offline development"""
+    
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        return list(texts)
+
+def load_backend(name: str):
+    """Backend by name: google, offline, or a module:Class path"""
+    if name == "google":
+        return GoogleBackend()
+    if name == "offline":
+        return OfflineBackend()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def pack_lines(texts: List[str], max_chars: int) -> List[List[str]]:
+    """Group texts into batches whose newline-joined length stays under max_chars"""
+    batches = []
+    batch, size = [], 0
+    for text in texts:
+        if batch and size + len(text) + 1 > max_chars:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(text)
+        size += len(text) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+class TranslationService:
+    """Translates text line by line through a persistent (source, target, text) cache,
+    deduping repeated lines and sending only the misses to the backend in batches"""
+    
+    def __init__(self, backend=None, db_path: str = None, max_entries: int = None, ttl: float = None):
+        self.backend = backend or load_backend(os.getenv('TRANSLATION_BACKEND', 'google'))
+        self.db_path = db_path or os.getenv('TRANSLATION_CACHE_PATH', 'cache/translations.db')
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('TRANSLATION_CACHE_SIZE', 50000))
+        self.ttl = ttl or float(os.getenv('TRANSLATION_CACHE_TTL', 30 * 24 * 3600))
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.inserts = 0
+        self.counters = {"hits": 0, "misses": 0, "backend_calls": 0}
+        self.conn = None
+        if self.max_entries > 0:
+            try:
+                os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS translations (
+                        key TEXT PRIMARY KEY,
+                        translated TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                self.conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Translation cache disabled: {e}", file=sys.stderr)
+                self.conn = None
+    
+    @staticmethod
+    def key(text: str, source: str, target: str) -> str:
+        return hashlib.sha256(f"{source}\0{target}\0{text}".encode("utf-8")).hexdigest()
+    
+    def translate(self, text: str, source: str, target: str) -> str:
+        """Translate a text, keeping its line structure"""
+        if source == target or not text:
+            return text
+        lines = text.split("\n")
+        translated = self.translate_many([line for line in lines if line.strip()], source, target)
+        results = iter(translated)
+        return "\n".join(next(results) if line.strip() else line for line in lines)
+    
+    def translate_many(self, texts: List[str], source: str, target: str) -> List[str]:
+        """Translate several texts with one cache lookup and batched backend calls for the misses"""
+        if source == target or not texts:
+            return list(texts)
+        
+        keys = {text: self.key(text, source, target) for text in texts}
+        found = {}
+        with self.lock:
+            for text, key in keys.items():
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[text] = self.memory[key]
+        found.update(self.lookup({text: key for text, key in keys.items() if text not in found}))
+        
+        missing = [text for text in keys if text not in found]
+        self.counters["hits"] += len(keys) - len(missing)
+        self.counters["misses"] += len(missing)
+        if missing:
+            self.counters["backend_calls"] += 1
+            translated = self.backend.translate_batch(missing, source, target)
+            found.update(zip(missing, translated))
+            self.store({keys[text]: found[text] for text in missing})
+        
+        with self.lock:
+            for text, key in keys.items():
+                self.memory[key] = found[text]
+                self.memory.move_to_end(key)
+            while len(self.memory) > MEMORY_ENTRIES:
+                self.memory.popitem(last=False)
+        return [found[text] for text in texts]
+    
+    def lookup(self, keys: Dict[str, str]) -> Dict[str, str]:
+        """Unexpired translations from the SQLite cache"""
+        if not self.conn or not keys:
+            return {}
+        now = time.time()
+        try:
+            with self.lock:
+                placeholders = ",".join("?" * len(keys))
+                rows = dict(self.conn.execute(
+                    f"SELECT key, translated FROM translations WHERE key IN ({placeholders}) AND created_at > ?",
+                    [*keys.values(), now - self.ttl]
+                ).fetchall())
+                if rows:
+                    self.conn.executemany("UPDATE translations SET last_used = ? WHERE key = ?", ((now, key) for key in rows))
+                    self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Translation cache read error: {e}", file=sys.stderr)
+            return {}
+        return {text: rows[key] for text, key in keys.items() if key in rows}
+    
+    def store(self, translations: Dict[str, str]):
+        """Save new translations, trimming the least recently used past the size limit"""
+        if not self.conn:
+            return
+        now = time.time()
+        try:
+            with self.lock:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO translations (key, translated, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    ((key, translated, now, now) for key, translated in translations.items())
+                )
+                self.inserts += len(translations)
+                if self.inserts >= PRUNE_INTERVAL:
+                    self.inserts = 0
+                    self.conn.execute("DELETE FROM translations WHERE created_at <= ?", (now - self.ttl,))
+                    self.conn.execute(
+                        "DELETE FROM translations WHERE key IN "
+                        "(SELECT key FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Translation cache write error: {e}", file=sys.stderr)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.conn is not None, **self.counters}
@@ -1,8 +1,22 @@
 #!/usr/bin/env python3
 import sys
 import json
-from gtts import gTTS
+import os
+import re
+import time
+import hashlib
+import importlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from typing import List, Dict, Any
+
+# Longest text sent to the backend in one request
+SEGMENT_CHARS = int(os.getenv('TTS_SEGMENT_CHARS', 300))
+# Segments synthesized at the same time
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', 4))
+
+SENTENCE_END = re.compile(r"(?<=[.!?।。！？])\s+|\n+")
 
 def main():
     try:
@@ -13,18 +27,170 @@ def main():
         text = data['text']
         language = data.get('language', 'en')
         
-        # Generate TTS
-        tts = gTTS(text=text, lang=language, slow=False)
-        audio_buffer = BytesIO()
-        tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
-        
-        # Output binary audio data
-        sys.stdout.buffer.write(audio_buffer.read())
-        
+        synthesizer = Synthesizer()
+        stats = synthesizer.stream(text, language, sys.stdout.buffer)
+        print(f"TTS: {json.dumps(stats)}", file=sys.stderr)
+    
     except Exception as e:
         print(f"TTS Error: {e}", file=sys.stderr)
         sys.exit(1)
 
+class GttsBackend:
+    """Google Translate's text-to-speech through gTTS, returning MP3 bytes"""
+    
+    def synthesize(self, text: str, language: str) -> bytes:
+        from gtts import gTTS
+        audio_buffer = BytesIO()
+        gTTS(text=text, lang=language, slow=False).write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
+class OfflineBackend:
+    """Deterministic placeholder bytes instead of audio, for tests and offline development"""
+    
+    def synthesize(self, text: str, language: str) -> bytes:
+        return f"[{language}] {text}\n".encode("utf-8")
+
+def load_backend(name: str):
+    """Backend by name: gtts, offline, or a module:Class path"""
+    if name == "gtts":
+        return GttsBackend()
+    if name == "offline":
+        return OfflineBackend()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def split_segments(text: str, max_chars: int = SEGMENT_CHARS) -> List[str]:
+    """Split text at sentence boundaries into segments of up to max_chars.
+    The first sentence is always its own segment so audio can start as soon as it is ready."""
+    sentences = [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence.strip()]
+    segments = []
+    for sentence in sentences:
+        # A sentence longer than the limit is cut at the last space that fits
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if len(segments) > 1 and len(segments[-1]) + len(sentence) + 1 <= max_chars:
+            segments[-1] = f"{segments[-1]} {sentence}"
+        elif sentence:
+            segments.append(sentence)
+    return segments
+
+class AudioCache:
+    """Synthesized audio on disk, one file per (language, text) hash.
+    Hits refresh the file's modification time; past the size limit the oldest files are evicted."""
+    
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or os.getenv('TTS_CACHE_DIR', 'cache/tts')
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('TTS_CACHE_BYTES', 200 * 1024 * 1024))
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        if self.max_bytes > 0:
+            os.makedirs(self.directory, exist_ok=True)
+    
+    def path(self, text: str, language: str) -> str:
+        key = hashlib.sha256(f"{language}\0{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.audio")
+    
+    def get(self, text: str, language: str):
+        if self.max_bytes <= 0:
+            return None
+        path = self.path(text, language)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except OSError:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return audio
+    
+    def put(self, text: str, language: str, audio: bytes):
+        if self.max_bytes <= 0 or len(audio) > self.max_bytes:
+            return
+        path = self.path(text, language)
+        # Written under a unique name and renamed, so concurrent readers never see a partial file
+        temporary = f"{path}.{os.getpid()}.{id(audio)}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(audio)
+            os.replace(temporary, path)
+            self.evict()
+        except OSError as e:
+            print(f"TTS cache write error: {e}", file=sys.stderr)
+    
+    def evict(self):
+        """Remove the least recently used files until the cache fits its size limit"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".audio"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.counters["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+class Synthesizer:
+    """Speaks text segment by segment: cached segments are reused, the rest are synthesized
+    concurrently, and audio is written in order as each segment becomes ready"""
+    
+    def __init__(self, backend=None, cache: AudioCache = None, workers: int = TTS_WORKERS):
+        self.backend = backend or load_backend(os.getenv('TTS_BACKEND', 'gtts'))
+        self.cache = cache or AudioCache()
+        self.workers = workers
+    
+    def segment_audio(self, text: str, language: str) -> bytes:
+        audio = self.cache.get(text, language)
+        if audio is None:
+            audio = self.backend.synthesize(text, language)
+            self.cache.put(text, language, audio)
+        return audio
+    
+    def stream(self, text: str, language: str, out) -> Dict[str, Any]:
+        start_time = time.time()
+        segments = split_segments(text)
+        if not segments:
+            raise ValueError("No text to speak")
+        
+        first_audio = None
+        written = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(segments)))) as executor:
+            # Only a bounded window of segments is in flight ahead of the one being written
+            pending = deque()
+            remaining = iter(segments)
+            for segment in remaining:
+                pending.append(executor.submit(self.segment_audio, segment, language))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                audio = pending.popleft().result()
+                segment = next(remaining, None)
+                if segment is not None:
+                    pending.append(executor.submit(self.segment_audio, segment, language))
+                out.write(audio)
+                out.flush()
+                written += len(audio)
+                if first_audio is None:
+                    first_audio = time.time() - start_time
+        
+        return {
+            "segments": len(segments),
+            "bytes": written,
+            "first_audio": round(first_audio, 3),
+            "seconds": round(time.time() - start_time, 3),
+            **{f"cache_{name}": value for name, value in self.cache.counters.items()}
+        }
+
 if __name__ == "__main__":
     main()
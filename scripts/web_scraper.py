@@ -2,9 +2,26 @@
 import sys
 import json
 import os
-from tavily import TavilyClient
+import re
+import time
+import hashlib
+import importlib
 import datetime
 import pytz
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List
+
+SCRAPED_DIR = "scraped_data"
+# Pages seen by earlier crawls and the progress of the current run
+CRAWL_STATE_PATH = os.getenv('CRAWL_STATE_PATH', 'cache/crawl_state.json')
+# Seed URLs crawled at the same time
+CRAWL_WORKERS = int(os.getenv('CRAWL_WORKERS', 4))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 3))
+# Run the incremental indexer on the crawled pages
+CRAWL_AUTO_INDEX = os.getenv('CRAWL_AUTO_INDEX', '1') == '1'
+# Also index after every this many finished seeds, so long crawls become searchable part way; 0 indexes once at the end.
+# Each run rewrites the index and invalidates the chat workers' caches, so this should stay well above 1.
+CRAWL_INDEX_EVERY = int(os.getenv('CRAWL_INDEX_EVERY', 0))
 
 def main():
     try:
@@ -12,51 +29,19 @@ def main():
         input_data = sys.stdin.read()
         data = json.loads(input_data)
         
-        url = data['url']
+        seeds = data.get('urls') or [data['url']]
         keep_old_data = data.get('keepOldData', False)
         
-        # Initialize Tavily client
-        tavily_api_key = os.getenv('TAVILY_API_KEY')
-        if not tavily_api_key:
-            raise Exception("TAVILY_API_KEY not found")
-        
-        tavily_client = TavilyClient(api_key=tavily_api_key)
-        
-        # Create scraped_data directory
-        os.makedirs("scraped_data", exist_ok=True)
-        
-        # Clear old data if requested
-        if not keep_old_data:
-            for file in os.listdir("scraped_data"):
-                if file.endswith('.txt'):
-                    os.remove(os.path.join("scraped_data", file))
-        
-        # Scrape website
-        crawl_results = tavily_client.crawl(url=url, max_depth=3, extract_depth="advanced")
+        client = load_client(os.getenv('CRAWL_CLIENT', 'tavily'))
+        result = crawl(client, seeds, keep_old_data=keep_old_data,
+                       max_depth=data.get('maxDepth', CRAWL_MAX_DEPTH),
+                       index=data.get('index', CRAWL_AUTO_INDEX))
         
-        if not crawl_results["results"]:
+        if not result["pages"]:
             raise Exception("No data scraped from the website")
         
-        pages_scraped = 0
-        for i, result in enumerate(crawl_results["results"]):
-            content = result.get("raw_content", "")
-            if content.strip():
-                timestamp = datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y%m%d_%H%M')
-                file_path = f"scraped_data/page_{i+1}_{url.replace('https://', '').replace('/', '_')}_{timestamp}.txt"
-                
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-                
-                pages_scraped += 1
-        
-        result = {
-            "success": True,
-            "pages": pages_scraped,
-            "url": url
-        }
-        
         print(json.dumps(result))
-        
+    
     except Exception as e:
         error_result = {
             "success": False,
@@ -66,5 +51,204 @@ def main():
         print(json.dumps(error_result))
         sys.exit(1)
 
+class TavilyCrawlClient:
+    """Tavily's crawl endpoint"""
+    
+    def __init__(self):
+        from tavily import TavilyClient
+        tavily_api_key = os.getenv('TAVILY_API_KEY')
+        if not tavily_api_key:
+            raise Exception("TAVILY_API_KEY not found")
+        self.client = TavilyClient(api_key=tavily_api_key)
+    
+    def crawl(self, url: str, max_depth: int) -> List[Dict[str, str]]:
+        results = self.client.crawl(url=url, max_depth=max_depth, extract_depth="advanced")
+        return results.get("results") or []
+
+class LocalCrawlClient:
+    """Serves .txt and .html files under a local directory as pages, for tests and offline development.
+    Seeds are directory paths or file:// URLs."""
+    
+    def crawl(self, url: str, max_depth: int) -> List[Dict[str, str]]:
+        root = url[len("file://"):] if url.startswith("file://") else url
+        pages = []
+        for directory, subdirs, files in os.walk(root):
+            if directory[len(root):].count(os.sep) >= max_depth:
+                subdirs[:] = []
+            for file_name in sorted(files):
+                if file_name.endswith((".txt", ".html")):
+                    path = os.path.join(directory, file_name)
+                    with open(path, encoding="utf-8") as f:
+                        pages.append({"url": f"file://{os.path.abspath(path)}", "raw_content": f.read()})
+        return pages
+
+def load_client(name: str):
+    """Crawl client by name: tavily, local, or a module:Class path"""
+    if name == "tavily":
+        return TavilyCrawlClient()
+    if name == "local":
+        return LocalCrawlClient()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def page_file_name(url: str) -> str:
+    """Stable file name for a page URL, so a re-crawl overwrites the page instead of adding a copy"""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", re.sub(r"^\w+://", "", url)).strip("_")[:80]
+    return f"page_{slug}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]}.txt"
+
+def load_state(path: str = CRAWL_STATE_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        state.setdefault("pages", {})
+        return state
+    except (OSError, ValueError):
+        return {"pages": {}, "run": None}
+
+def save_state(state: Dict[str, Any], path: str = CRAWL_STATE_PATH):
+    """Write the state atomically, so a crash mid-write keeps the previous copy"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+def write_page(file_name: str, content: str):
+    # Written under a name the indexer skips, then renamed once complete
+    path = os.path.join(SCRAPED_DIR, file_name)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(f"{path}.tmp", path)
+
+def store_pages(state: Dict[str, Any], seed: str, pages: List[Dict[str, str]], keep_old_data: bool) -> Dict[str, int]:
+    """Write the seed's new or changed pages and, unless keeping old data, remove its pages that are gone"""
+    counts = {"pages": 0, "written": 0, "unchanged": 0, "removed": 0}
+    timestamp = datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M:%S')
+    seen = set()
+    for page in pages:
+        url = page.get("url") or seed
+        content = page.get("raw_content") or ""
+        if not content.strip() or url in seen:
+            continue
+        seen.add(url)
+        counts["pages"] += 1
+        
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        known = state["pages"].get(url)
+        file_name = page_file_name(url)
+        if known and known["hash"] == content_hash and os.path.exists(os.path.join(SCRAPED_DIR, known["file"])):
+            counts["unchanged"] += 1
+            known["seed"] = seed
+            continue
+        write_page(file_name, content)
+        state["pages"][url] = {"hash": content_hash, "file": file_name, "seed": seed, "crawled_at": timestamp}
+        counts["written"] += 1
+    
+    if not keep_old_data:
+        for url, known in list(state["pages"].items()):
+            if known.get("seed") == seed and url not in seen:
+                remove_scraped_file(known["file"])
+                del state["pages"][url]
+                counts["removed"] += 1
+    return counts
+
+def remove_scraped_file(file_name: str):
+    try:
+        os.remove(os.path.join(SCRAPED_DIR, file_name))
+    except FileNotFoundError:
+        pass
+
+def remove_untracked_pages(state: Dict[str, Any]) -> int:
+    """Delete crawled pages no longer in the state, such as the timestamped files of older crawls.
+    Uploaded files are left alone."""
+    tracked = {known["file"] for known in state["pages"].values()}
+    removed = 0
+    for file_name in os.listdir(SCRAPED_DIR):
+        if file_name.startswith("page_") and file_name.endswith(".txt") and file_name not in tracked:
+            remove_scraped_file(file_name)
+            removed += 1
+    return removed
+
+def index_new_text() -> dict:
+    """Run the incremental indexer, which embeds only files that are new or changed"""
+    try:
+        from data_indexer import load_and_index_data
+        return load_and_index_data()
+    except Exception as e:
+        print(f"Indexing after crawl failed: {e}", file=sys.stderr)
+        return {"success": False, "error": str(e)}
+
+def crawl(client, seeds: List[str], keep_old_data: bool = False, max_depth: int = CRAWL_MAX_DEPTH,
+          index: bool = CRAWL_AUTO_INDEX, state_path: str = CRAWL_STATE_PATH) -> Dict[str, Any]:
+    """Crawl the seeds concurrently, storing each seed's pages as soon as it finishes, then index the changes once.
+    A run interrupted part way resumes with the seeds it had not finished."""
+    start_time = time.time()
+    os.makedirs(SCRAPED_DIR, exist_ok=True)
+    seeds = list(dict.fromkeys(seeds))
+    state = load_state(state_path)
+    
+    run = state.get("run")
+    if run and sorted(run["seeds"]) == sorted(seeds) and run.get("max_depth") == max_depth:
+        done = [seed for seed in seeds if seed in run["done"]]
+        print(f"Resuming crawl, {len(done)} of {len(seeds)} seeds already done", file=sys.stderr)
+    else:
+        run = state["run"] = {"seeds": seeds, "max_depth": max_depth, "done": []}
+        save_state(state, state_path)
+    pending = [seed for seed in seeds if seed not in run["done"]]
+    
+    totals = {"pages": 0, "written": 0, "unchanged": 0, "removed": 0}
+    # Pages the interrupted run already stored for the seeds it finished
+    totals["pages"] = sum(1 for known in state["pages"].values() if known.get("seed") in run["done"])
+    errors = {}
+    indexed = []
+    # Pages stored by an interrupted run may never have been indexed
+    unindexed = bool(run["done"])
+    since_index = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(CRAWL_WORKERS, len(pending)))) as executor:
+        futures = {executor.submit(client.crawl, seed, max_depth): seed for seed in pending}
+        # Pages are stored and indexed on this thread while the other seeds are still being crawled
+        for future in as_completed(futures):
+            seed = futures[future]
+            try:
+                pages = future.result()
+            except Exception as e:
+                print(f"Crawl of {seed} failed: {e}", file=sys.stderr)
+                errors[seed] = str(e)
+                continue
+            counts = store_pages(state, seed, pages, keep_old_data)
+            for key, value in counts.items():
+                totals[key] += value
+            run["done"].append(seed)
+            save_state(state, state_path)
+            print(f"Crawled {seed}: {counts['pages']} pages ({counts['written']} written, "
+                  f"{counts['unchanged']} unchanged, {counts['removed']} removed)", file=sys.stderr)
+            unindexed = unindexed or bool(counts["written"] or counts["removed"])
+            since_index += 1
+            if index and unindexed and CRAWL_INDEX_EVERY and since_index >= CRAWL_INDEX_EVERY:
+                indexed.append(index_new_text())
+                unindexed = False
+                since_index = 0
+    
+    if not keep_old_data and not errors:
+        removed = remove_untracked_pages(state)
+        totals["removed"] += removed
+        unindexed = unindexed or bool(removed)
+    if index and unindexed:
+        indexed.append(index_new_text())
+    if not errors:
+        # Finished: the next run starts over instead of resuming
+        state["run"] = None
+    save_state(state, state_path)
+    
+    return {
+        "success": not errors or bool(totals["pages"]),
+        **totals,
+        "seeds": len(seeds),
+        "resumed": len(seeds) - len(pending),
+        "errors": errors,
+        "indexed": indexed,
+        "seconds": round(time.time() - start_time, 3),
+        "url": seeds[0]
+    }
+
 if __name__ == "__main__":
     main()
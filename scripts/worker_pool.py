@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+import sys
+import os
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from typing import Dict, Any, Callable
+
+BUSY_RESULT = {
+    "success": False,
+    "busy": True,
+    "text": "I'm answering a lot of questions right now. Please try again in a moment.",
+    "followUps": []
+}
+
+# Consecutive times a worker may exit before becoming ready before it is left stopped
+RESTART_LIMIT = int(os.getenv('CHAT_WORKER_RESTARTS', 5))
+# Seconds before the first restart of a worker, doubling with each failure up to RESTART_BACKOFF_MAX
+RESTART_BACKOFF = 0.5
+RESTART_BACKOFF_MAX = 30
+
+TIMEOUT_RESULT = {
+    "success": False,
+    "timeout": True,
+    "text": "That took longer than expected. Please try again or ask about universities, programs, or visa requirements.",
+    "followUps": []
+}
+
+def final_result(result: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a canned result, marking it as the last event of a streamed request"""
+    result = dict(result)
+    if request.get('stream'):
+        result["type"] = "done"
+    return result
+
+def worker_main(worker_id: int, task_queue, result_queue):
+    """Run one warm ChatProcessor and answer tasks until told to stop"""
+    # Every worker maps the same index file read-only instead of holding a private copy
+    os.environ["FAISS_MMAP"] = "1"
+    from chat_processor import ChatProcessor, ERROR_TEXT, handle_chat, stream_chat, readiness
+    
+    processor = ChatProcessor(preload=True)
+    result_queue.put(("ready", worker_id, readiness(processor)))
+    
+    while True:
+        task = task_queue.get()
+        if task is None:
+            processor.conversation_log.close()
+            break
+        key, request, deadline = task
+        
+        # Requests that waited out their deadline in the queue are not worth starting
+        if time.time() > deadline:
+            result_queue.put(("result", key, final_result(TIMEOUT_RESULT, request)))
+            continue
+        
+        try:
+            if request.get('stream'):
+                # Intermediate events leave the request pending; "done" completes it
+                stream_chat(processor, request, lambda event: result_queue.put(
+                    ("result" if event["type"] == "done" else "event", key, event)
+                ))
+                result_queue.put(("stats", worker_id, processor.response_cache.stats()))
+                continue
+            result = handle_chat(processor, request)
+        except Exception as e:
+            print(f"Worker {worker_id} error: {e}", file=sys.stderr)
+            result = final_result({"success": False, "error": str(e), "text": ERROR_TEXT}, request)
+        result_queue.put(("result", key, result))
+        result_queue.put(("stats", worker_id, processor.response_cache.stats()))
+
+class WorkerPool:
+    """Warm ChatProcessor processes fed from a bounded request queue"""
+    
+    def __init__(self, num_workers: int = None, queue_size: int = None, deadline: float = None):
+        self.num_workers = num_workers or int(os.getenv('CHAT_WORKERS', os.cpu_count() or 1))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv('CHAT_QUEUE_SIZE', 32))
+        self.deadline = deadline or float(os.getenv('CHAT_DEADLINE', 30))
+        self.capacity = self.num_workers + self.queue_size
+        
+        self.ctx = mp.get_context("spawn")
+        self.task_queue = self.ctx.Queue()
+        self.result_queue = self.ctx.Queue()
+        self.lock = threading.Lock()
+        self.all_ready = threading.Event()
+        self.pending = {}
+        self.keys = itertools.count()
+        self.workers = {}
+        self.ready_workers = {}
+        # Exits since each worker last became ready, when each dead worker may restart, and workers given up on
+        self.failures = {}
+        self.restart_at = {}
+        self.retired = set()
+        self.cache_stats = {}
+        self.stats = {"served": 0, "busy": 0, "timeouts": 0}
+        self.running = True
+        
+        for worker_id in range(self.num_workers):
+            self.start_worker(worker_id)
+        
+        threading.Thread(target=self.collect_results, daemon=True).start()
+        threading.Thread(target=self.watchdog, daemon=True).start()
+    
+    def start_worker(self, worker_id: int):
+        """Start (or restart) a worker process"""
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, self.task_queue, self.result_queue),
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = process
+        print(f"Started chat worker {worker_id} (pid {process.pid})", file=sys.stderr)
+    
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until every worker still being restarted has finished loading.
+        False on timeout, or as soon as every worker has been given up on."""
+        give_up = time.time() + timeout if timeout is not None else None
+        while not self.all_ready.wait(0.25):
+            with self.lock:
+                if len(self.retired) >= self.num_workers:
+                    return False
+            if give_up is not None and time.time() > give_up:
+                return False
+        return True
+    
+    def check_all_ready(self):
+        """Caller holds the lock"""
+        expected = self.num_workers - len(self.retired)
+        if expected and len(self.ready_workers) >= expected:
+            self.all_ready.set()
+    
+    def submit(self, request: Dict[str, Any], reply: Callable[[Dict[str, Any]], None]):
+        """Queue a chat request, replying busy at once when the queue is full"""
+        deadline = time.time() + float(request.get('deadline', self.deadline))
+        
+        with self.lock:
+            if len(self.pending) >= self.capacity:
+                self.stats["busy"] += 1
+                key = None
+            else:
+                key = next(self.keys)
+                self.pending[key] = (reply, deadline, request)
+        
+        if key is None:
+            reply(final_result(BUSY_RESULT, request))
+            return
+        
+        self.task_queue.put((key, request, deadline))
+    
+    def collect_results(self):
+        """Deliver worker results to the callers still waiting for them"""
+        while self.running:
+            try:
+                kind, key, payload = self.result_queue.get()
+            except (EOFError, OSError):
+                break
+            
+            if kind == "ready":
+                with self.lock:
+                    self.ready_workers[key] = payload
+                    self.failures[key] = 0
+                    self.check_all_ready()
+                continue
+            
+            if kind == "stats":
+                with self.lock:
+                    self.cache_stats[key] = payload
+                continue
+            
+            if kind == "event":
+                with self.lock:
+                    entry = self.pending.get(key)
+                if entry:
+                    entry[0](payload)
+                continue
+            
+            with self.lock:
+                entry = self.pending.pop(key, None)
+                if entry:
+                    self.stats["served"] += 1
+            # The caller may already have been answered with a timeout
+            if entry:
+                entry[0](payload)
+    
+    def watchdog(self):
+        """Expire overdue requests and replace workers that died"""
+        while self.running:
+            time.sleep(0.25)
+            now = time.time()
+            
+            with self.lock:
+                expired = [key for key, (_, deadline, _) in self.pending.items() if now > deadline]
+                entries = [self.pending.pop(key) for key in expired]
+                self.stats["timeouts"] += len(entries)
+            for reply, _, request in entries:
+                reply(final_result(TIMEOUT_RESULT, request))
+            
+            for worker_id, process in list(self.workers.items()):
+                if self.running and not process.is_alive():
+                    self.restart_worker(worker_id, process, now)
+    
+    def restart_worker(self, worker_id: int, process, now: float):
+        """Restart a dead worker after a backoff that grows while it keeps failing before it is ready,
+        leaving it stopped once it has failed RESTART_LIMIT times in a row"""
+        with self.lock:
+            if worker_id not in self.restart_at:
+                failures = self.failures.get(worker_id, 0) + 1
+                self.failures[worker_id] = failures
+                self.ready_workers.pop(worker_id, None)
+                if failures > RESTART_LIMIT:
+                    print(f"Chat worker {worker_id} exited with code {process.exitcode} {failures} times in a row, "
+                          f"not restarting it", file=sys.stderr)
+                    del self.workers[worker_id]
+                    self.retired.add(worker_id)
+                    self.check_all_ready()
+                    return
+                delay = min(RESTART_BACKOFF * 2 ** (failures - 1), RESTART_BACKOFF_MAX)
+                print(f"Chat worker {worker_id} exited with code {process.exitcode}, restarting in {delay:.1f}s",
+                      file=sys.stderr)
+                self.restart_at[worker_id] = now + delay
+            if now < self.restart_at[worker_id]:
+                return
+            del self.restart_at[worker_id]
+        self.start_worker(worker_id)
+    
+    def status(self) -> Dict[str, Any]:
+        """Readiness and queue depth of the pool"""
+        with self.lock:
+            return {
+                "ready": len(self.ready_workers) > 0,
+                "workers": self.num_workers,
+                "ready_workers": len(self.ready_workers),
+                "stopped_workers": len(self.retired),
+                "pending": len(self.pending),
+                "capacity": self.capacity,
+                "cache": self.combined_cache_stats(),
+                **self.stats
+            }
+    
+    def combined_cache_stats(self) -> Dict[str, Any]:
+        """Response cache counters summed over workers (each worker has its own cache)"""
+        combined = {}
+        for stats in self.cache_stats.values():
+            for name, value in stats.items():
+                if name != "hit_rate":
+                    combined[name] = combined.get(name, 0) + value
+        lookups = combined.get("exact_hits", 0) + combined.get("semantic_hits", 0) + combined.get("misses", 0)
+        if lookups:
+            combined["hit_rate"] = round((lookups - combined["misses"]) / lookups, 3)
+        return combined
+    
+    def shutdown(self):
+        """Stop all workers"""
+        self.running = False
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for process in self.workers.values():
+            process.join(timeout=5)
@@ -0,0 +1,29 @@
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = 0
+    
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype="float32")
+
+def last_used(cache):
+    return dict(cache.conn.execute("SELECT key, last_used FROM entries").fetchall())
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    cache = EmbeddingCache("model", str(tmp_path), max_entries=4)
+    model = CountingModel()
+    cache.encode(model, ["tuition at MIT"])
+    stored = last_used(cache)
+    changes = cache.conn.total_changes
+    
+    assert cache.encode(model, ["tuition at MIT"]).tolist() == [[14.0, 1.0]]
+    assert model.encoded == 1
+    assert cache.conn.total_changes == changes
+    
+    cache.flush()
+    key = cache.key("tuition at MIT")
+    assert last_used(cache)[key] > stored[key]
+    assert cache.recent == {}
@@ -0,0 +1,55 @@
+import sqlite3
+import pytest
+from entity_vocabulary import EntityVocabulary
+from intent_matcher import IntentMatcher
+
+@pytest.fixture
+def matcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("chatbot.db")
+    conn.execute("CREATE TABLE universities (university TEXT, program TEXT, tuition INTEGER, location TEXT, visa_service TEXT)")
+    conn.executemany("INSERT INTO universities VALUES (?, ?, ?, ?, ?)", [
+        ("MIT", "Computer Science", 55000, "Cambridge, MA", "Yes"),
+        ("Stanford", "Economics", 57000, "Stanford, CA", "Yes")
+    ])
+    conn.commit()
+    conn.close()
+    return IntentMatcher(EntityVocabulary("chatbot.db"))
+
+def test_tuition_lookup(matcher):
+    match = matcher.match("What is the tuition at MIT?")
+    assert match["sql"] == "SELECT tuition FROM universities WHERE university = ?"
+    assert match["params"] == ["MIT"]
+
+def test_program_list(matcher):
+    match = matcher.match("Which universities offer Computer Science?")
+    assert match["sql"] == "SELECT university FROM universities WHERE program = ?"
+
+@pytest.mark.parametrize("query, sql, amount", [
+    ("Which universities have tuition over 55,000?", "tuition > ?", 55000),
+    ("Which universities have tuition under $55,000?", "tuition < ?", 55000),
+    ("List universities with tuition below $56k", "tuition < ?", 56000),
+    ("Which universities have tuition over 55000", "tuition > ?", 55000)
+])
+def test_tuition_bound_uses_the_whole_amount(matcher, query, sql, amount):
+    match = matcher.match(query)
+    assert match["sql"] == f"SELECT university, tuition FROM universities WHERE {sql}"
+    assert match["params"] == [amount]
+
+@pytest.mark.parametrize("query", [
+    "Which universities have tuition over 55 000?",
+    "Which universities have tuition under 5,50,00?",
+    "Which universities have tuition between 40,000 and 60,000?",
+    "Which universities have tuition under $55.55?"
+])
+def test_unparseable_tuition_bound_defers_to_gemini(matcher, query):
+    assert matcher.match(query) is None
+
+@pytest.mark.parametrize("query", [
+    "Does MIT offer scholarships?",
+    "What documents do I need for an F-1 visa at MIT?",
+    "Can I study part time at MIT?",
+    "What scholarships does Stanford offer for Economics?"
+])
+def test_questions_outside_the_table_defer_to_gemini(matcher, query):
+    assert matcher.match(query) is None
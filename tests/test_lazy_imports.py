@@ -0,0 +1,12 @@
+import os
+import sys
+import subprocess
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+def test_chat_processor_import_leaves_heavy_modules_unloaded():
+    # A fresh interpreter, since other tests may already have imported numpy
+    code = ("import sys, chat_processor; "
+            "print(','.join(sorted(name for name in ('numpy', 'pytz', 'faiss', 'sentence_transformers') if name in sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == ""
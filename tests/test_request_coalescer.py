@@ -0,0 +1,38 @@
+import threading
+import time
+import pytest
+from request_coalescer import RequestCoalescer
+
+def test_followers_fall_back_when_the_leader_fails():
+    started = threading.Event()
+    release = threading.Event()
+    
+    def dispatch(request, reply):
+        if not started.is_set():
+            started.set()
+            release.wait()
+            raise RuntimeError("worker died")
+        reply({"success": True, "text": "answered separately"})
+    
+    coalescer = RequestCoalescer(dispatch, max_wait=60)
+    leader_errors = []
+    
+    def lead():
+        with pytest.raises(RuntimeError) as error:
+            coalescer.submit({"message": "Tuition at MIT?"}, lambda result: None)
+        leader_errors.append(error.value)
+    
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait()
+    replies = []
+    coalescer.submit({"message": "tuition at mit"}, replies.append)
+    release.set()
+    leader.join()
+    
+    deadline = time.time() + 5
+    while not replies and time.time() < deadline:
+        time.sleep(0.01)
+    assert leader_errors
+    assert replies == [{"success": True, "text": "answered separately"}]
+    assert coalescer.stats()["fallbacks"] == 1
@@ -0,0 +1,20 @@
+import pytest
+from response_cache import ResponseCache
+
+MIT = frozenset({("university", "MIT")})
+STANFORD = frozenset({("university", "Stanford University")})
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Keeps the data version stamps out of the repository
+    monkeypatch.chdir(tmp_path)
+    cache = ResponseCache(similarity=0.9)
+    cache.put("Tuition at MIT", "en", {"success": True, "text": "55000"}, [1.0, 0.0], MIT)
+    return cache
+
+def test_similar_question_about_the_same_entity_hits(cache):
+    assert cache.get("How much is tuition at MIT", "en", [0.99, 0.05], MIT)["text"] == "55000"
+
+def test_similar_question_about_another_entity_misses(cache):
+    assert cache.get("Tuition at Stanford University", "en", [0.99, 0.05], STANFORD) is None
+    assert cache.get("Tuition", "en", [0.99, 0.05], frozenset()) is None
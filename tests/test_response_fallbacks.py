@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from chat_processor import ChatProcessor, RAG_FALLBACK_TEXT
+from entity_vocabulary import EntityVocabulary
+from response_cache import ResponseCache
+
+class PrefixTranslator:
+    """Marks text translated out of English so it never equals the English original"""
+    
+    def translate(self, text: str, source: str, target: str) -> str:
+        return text if target == "en" else f"[{target}] {text}"
+
+class FailingModel:
+    def generate_content(self, prompt, stream=False):
+        raise RuntimeError("quota exceeded")
+
+class AnsweringModel:
+    class Response:
+        text = "Tuition is $40,000."
+    
+    def generate_content(self, prompt, stream=False):
+        return self.Response()
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    # Keeps the response cache's data version stamps out of the repository
+    monkeypatch.chdir(tmp_path)
+    processor = ChatProcessor.__new__(ChatProcessor)
+    processor.response_cache = ResponseCache()
+    processor.translator = PrefixTranslator()
+    processor.entity_vocabulary = EntityVocabulary("chatbot.db")
+    processor.embeddings_loaded = True
+    processor.ensure_embeddings = lambda lazy=True: True
+    processor.retrieve_context = lambda translated_query, query_embedding=None: "context"
+    return processor
+
+def test_translated_fallback_is_not_cached(processor):
+    processor.model = FailingModel()
+    result = processor.try_rag_query("question", "fr", translated_query="question")
+    assert result["text"] == f"[fr] {RAG_FALLBACK_TEXT}"
+    assert processor.response_cache.get("question", "fr") is None
+
+def test_translated_fallback_is_not_cached_by_async_pipeline(processor):
+    processor.model = FailingModel()
+    
+    async def run():
+        sql_missed = asyncio.Event()
+        sql_missed.set()
+        return await processor.rag_branch("question", "fr", None, "question", None, sql_missed)
+    
+    assert asyncio.run(run())["text"] == f"[fr] {RAG_FALLBACK_TEXT}"
+    assert processor.response_cache.get("question", "fr") is None
+
+def test_translated_answer_is_cached(processor):
+    processor.model = AnsweringModel()
+    processor.try_rag_query("question", "fr", translated_query="question")
+    assert processor.response_cache.get("question", "fr")["text"] == "[fr] Tuition is $40,000."
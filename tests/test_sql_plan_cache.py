@@ -0,0 +1,64 @@
+import sqlite3
+import pytest
+from chat_processor import ChatProcessor
+from entity_vocabulary import EntityVocabulary
+from sql_plan_cache import SqlPlanCache
+
+class SqlModel:
+    """Stands in for Gemini, answering SQL prompts with a fixed statement"""
+    
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.calls = 0
+    
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        return type("Response", (), {"text": self.sql})()
+
+class NoIntents:
+    def match(self, query, entities=None):
+        return None
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("chatbot.db")
+    conn.execute("CREATE TABLE universities (university TEXT, program TEXT, tuition INTEGER, location TEXT, visa_service TEXT)")
+    conn.execute("INSERT INTO universities VALUES ('MIT', 'Computer Science', 55000, 'Cambridge, MA', 'Yes')")
+    conn.commit()
+    conn.close()
+    processor = ChatProcessor.__new__(ChatProcessor)
+    processor.db_path = "chatbot.db"
+    processor.entity_vocabulary = EntityVocabulary("chatbot.db")
+    processor.intent_matcher = NoIntents()
+    processor.sql_plan_cache = SqlPlanCache("chatbot.db")
+    return processor
+
+def stored_plans():
+    with sqlite3.connect("chatbot.db") as conn:
+        return conn.execute("SELECT COUNT(*) FROM sql_plan_cache").fetchone()[0]
+
+def test_plan_is_stored_after_it_executes(processor):
+    processor.model = SqlModel("SELECT tuition FROM universities WHERE university = 'MIT'")
+    assert processor.run_sql_query("tuition at MIT")["text"] == "55000"
+    assert stored_plans() == 1
+
+def test_failing_plan_is_not_stored(processor):
+    processor.model = SqlModel("SELECT fees FROM universities WHERE university = 'MIT'")
+    with pytest.raises(sqlite3.Error):
+        processor.run_sql_query("tuition at MIT")
+    assert stored_plans() == 0
+    
+    processor.model.sql = "SELECT tuition FROM universities WHERE university = 'MIT'"
+    assert processor.run_sql_query("tuition at MIT")["text"] == "55000"
+    assert processor.model.calls == 2
+
+def test_cached_plan_that_fails_is_forgotten(processor):
+    processor.model = SqlModel("SELECT tuition FROM universities WHERE university = 'MIT'")
+    processor.run_sql_query("tuition at MIT")
+    with sqlite3.connect("chatbot.db") as conn:
+        conn.execute("ALTER TABLE universities RENAME COLUMN tuition TO fees")
+    with pytest.raises(sqlite3.Error):
+        processor.run_sql_query("tuition at MIT")
+    assert stored_plans() == 0
+    assert processor.sql_plan_cache.plans == {}